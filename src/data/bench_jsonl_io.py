@@ -0,0 +1,75 @@
+"""
+Rows/s of the old per-script JSONL code vs jsonl_io on one file.
+
+  read   list of json.loads per line -> DataFrame   vs  read_jsonl_df (workers 1 / N)
+  write  df.iterrows() + json.dumps per row         vs  write_df_jsonl
+
+and checks that both writers produce byte-identical files.
+
+Usage:
+    python src/data/bench_jsonl_io.py data/processed/finance_combined.jsonl --repeat 5 --workers 4
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from jsonl_io import read_jsonl_df, write_df_jsonl
+
+
+def old_read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return pd.DataFrame([json.loads(line) for line in f])
+
+
+def old_write(df, path, columns):
+    with open(path, "w", encoding="utf-8") as f:
+        for _, row in df.iterrows():
+            f.write(json.dumps({c: row[c] for c in columns}) + "\n")
+
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark jsonl_io against the old iterrows/json code")
+    parser.add_argument("path", type=str)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    df = old_read(args.path)
+    n = len(df)
+    columns = list(df.columns)
+    print(f"{args.path}: {n} rows, columns {columns}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_out, new_out = Path(tmp) / "old.jsonl", Path(tmp) / "new.jsonl"
+        cases = [
+            ("read   json.loads list", lambda: old_read(args.path)),
+            ("read   read_jsonl_df", lambda: read_jsonl_df(args.path)),
+            (f"read   read_jsonl_df workers={args.workers}", lambda: read_jsonl_df(args.path, args.workers)),
+            ("write  iterrows + json.dumps", lambda: old_write(df, old_out, columns)),
+            ("write  write_df_jsonl", lambda: write_df_jsonl(df, new_out, columns)),
+        ]
+        for name, fn in cases:
+            t = best_time(fn, args.repeat)
+            print(f"  {name:<40} {t * 1000:8.1f} ms  {n / t:12,.0f} rows/s")
+        same = filecmp.cmp(old_out, new_out, shallow=False)
+        print("Outputs byte-identical:", same)
+
+
+if __name__ == "__main__":
+    main()
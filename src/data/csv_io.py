@@ -0,0 +1,113 @@
+"""
+Chunked CSV reading for the review-based labeled datasets.
+
+  iter_csv_chunks(path, usecols)   string-typed DataFrame chunks in file order
+                                   (missing -> NA); chunk_rows rows with pandas,
+                                   ~16MB blocks with pyarrow
+  csv_columns(path)                header only
+
+Uses pyarrow's streaming CSV reader (multi-threaded block parsing) when
+pyarrow is installed, and pd.read_csv(chunksize=..., dtype=str) otherwise.
+Both treat the same strings as missing as pd.read_csv does by default, or
+nothing at all with keep_default_na=False (plain csv-module semantics, where
+every value is a string). Values are never type-inferred, so the caller
+converts the columns it needs (e.g. pd.to_numeric on ratings) once per chunk.
+Columns come back as object dtype (plain Python str), so .str methods follow
+Python's re / str semantics (unicode digits and whitespace) like the per-row code
+they replace, not the ASCII-only regexes of pandas' Arrow-backed strings.
+
+Rows with more or fewer fields than the header are an error under pyarrow
+and pandas' C parser. With ragged=True they are read like csv.DictReader
+reads them (missing fields -> NA, extra fields dropped): the file is read with
+pyarrow up to the block with the first such row, and the rest with pandas'
+python parser, which can truncate long rows.
+"""
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # optional fast reader
+    pa = pacsv = None
+
+
+CHUNK_ROWS = 100_000
+PYARROW_BLOCK_BYTES = 16 << 20
+
+# pd.read_csv's default missing-value markers (pandas._libs.parsers.STR_NA_VALUES)
+PANDAS_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def csv_columns(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _iter_pyarrow(path, usecols, keep_default_na):
+    columns = usecols or csv_columns(path)
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=PYARROW_BLOCK_BYTES),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={c: pa.string() for c in columns},
+            null_values=PANDAS_NA_VALUES if keep_default_na else [],
+            strings_can_be_null=keep_default_na,
+            quoted_strings_can_be_null=keep_default_na,
+        ),
+    )
+    for batch in reader:
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def _iter_pandas(path, usecols, keep_default_na, chunk_rows):
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=str, keep_default_na=keep_default_na, chunksize=chunk_rows):
+        yield chunk.astype(object)
+
+
+def _iter_ragged(path, usecols, keep_default_na, chunk_rows, skip_rows=0):
+    """pandas' python parser; short rows are padded with NA, long rows cut to the header's width."""
+    width = len(csv_columns(path))
+    chunks = pd.read_csv(
+        path,
+        usecols=usecols,
+        dtype=str,
+        keep_default_na=keep_default_na,
+        chunksize=chunk_rows,
+        engine="python",
+        on_bad_lines=lambda fields: fields[:width],
+    )
+    for chunk in chunks:
+        if skip_rows >= len(chunk):
+            skip_rows -= len(chunk)
+            continue
+        yield chunk.iloc[skip_rows:].astype(object)
+        skip_rows = 0
+
+
+def _iter_pyarrow_ragged(path, usecols, keep_default_na, chunk_rows):
+    rows = 0
+    try:
+        for chunk in _iter_pyarrow(path, usecols, keep_default_na):
+            rows += len(chunk)
+            yield chunk
+    except pa.ArrowInvalid:
+        # a row with the wrong number of fields: the rows before it were read, continue from there
+        yield from _iter_ragged(path, usecols, keep_default_na, chunk_rows, skip_rows=rows)
+
+
+def iter_csv_chunks(path, usecols=None, keep_default_na=True, chunk_rows=CHUNK_ROWS, engine=None, ragged=False):
+    """Yield the CSV as string-typed DataFrame chunks, in file order."""
+    engine = engine or ("pyarrow" if pacsv is not None else "pandas")
+    if engine == "pyarrow":
+        if ragged:
+            return _iter_pyarrow_ragged(path, usecols, keep_default_na, chunk_rows)
+        return _iter_pyarrow(path, usecols, keep_default_na)
+    if ragged:
+        return _iter_ragged(path, usecols, keep_default_na, chunk_rows)
+    return _iter_pandas(path, usecols, keep_default_na, chunk_rows)
@@ -0,0 +1,227 @@
+"""
+Compact exact-dedupe store shared by the ingestion scripts.
+
+Replaces the `seen = set()` of full text strings (or (text, label) tuples)
+with fixed-size digests: blake2b-64 by default (8 bytes per record), or
+blake2b-128 with bits=128. Digests live in sorted numpy runs, looked up
+with np.searchsorted, plus a small set of recent additions:
+
+  - new digests collect in a set of at most BUFFER_SIZE entries, then become
+    a sorted run; runs of similar size are merged (like an LSM tree), so
+    there are only O(log n) runs to search
+  - past memory_budget_mb, the in-memory runs are merged and spilled to a
+    sorted .npy file in the store directory and searched via np.memmap
+
+With a path, the store persists across runs (runs + manifest.json), so an
+incremental re-ingestion can skip everything already emitted. The scripts
+turn that on through the DEDUPE_STATE_DIR environment variable:
+
+    DEDUPE_STATE_DIR=cache/dedupe python src/data/unlabel_financial_2.py
+
+keeps one store per output file (cache/dedupe/unlabel_financial_2/) and
+appends only new records to the existing output. Without it the scripts
+behave as before: a fresh in-memory store and an overwritten output file.
+
+Keys keep the distinctions of the old tuples: a non-string part (the int
+label 2) digests differently from the string "2". Stores written before
+that (no key_version in manifest.json) are dropped by for_output, and the
+output is rebuilt from scratch.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+BUFFER_SIZE = 1 << 16
+MANIFEST = "manifest.json"
+KEY_VERSION = 2  # 2: non-string key parts are marked as such
+STATE_DIR_ENV = "DEDUPE_STATE_DIR"
+
+DIGEST_DTYPES = {
+    64: np.dtype("<u8"),
+    128: np.dtype([("hi", "<u8"), ("lo", "<u8")]),
+}
+
+
+def stale_key_version(path):
+    manifest = Path(path) / MANIFEST
+    if not manifest.exists():
+        return False
+    with manifest.open() as f:
+        return json.load(f).get("key_version", 1) != KEY_VERSION
+
+
+class DedupeStore:
+    def __init__(self, path=None, bits=64, memory_budget_mb=256):
+        if bits not in DIGEST_DTYPES:
+            raise ValueError(f"bits must be 64 or 128, got {bits}")
+        self.bits = bits
+        self.dtype = DIGEST_DTYPES[bits]
+        self.memory_budget = memory_budget_mb * (1 << 20)
+        self.path = Path(path) if path else None
+
+        self.buffer = set()
+        self.memory_runs = []
+        self.disk_runs = []  # (file name, memmap)
+        self.runs = []  # everything searchable: memory runs + disk runs
+        self.count = 0
+        self._temporary = False
+
+        if self.path is not None:
+            self._load()
+
+    # ---------- keys ----------
+
+    def digest(self, *parts):
+        """Digest of one key; several parts (e.g. text, label) are joined unambiguously."""
+        # "\x1e" marks non-strings, so the label 2 and the label "2" stay different keys (as in a set of tuples)
+        key = "\x1f".join(p if isinstance(p, str) else f"\x1e{p}" for p in parts).encode("utf-8")
+        raw = hashlib.blake2b(key, digest_size=self.bits // 8).digest()
+        if self.bits == 64:
+            return int.from_bytes(raw, "little")
+        return int.from_bytes(raw[:8], "little"), int.from_bytes(raw[8:], "little")
+
+    def _in_runs(self, d):
+        probe = np.array(d, dtype=self.dtype)
+        for run in self.runs:
+            i = np.searchsorted(run, probe)
+            if i < len(run) and run[i] == probe:
+                return True
+        return False
+
+    def __contains__(self, key):
+        parts = key if isinstance(key, tuple) else (key,)
+        d = self.digest(*parts)
+        return d in self.buffer or self._in_runs(d)
+
+    def add(self, *parts):
+        """Record a key; returns True if it was new (i.e. the record should be written)."""
+        d = self.digest(*parts)
+        if d in self.buffer or self._in_runs(d):
+            return False
+        self.buffer.add(d)
+        self.count += 1
+        if len(self.buffer) >= BUFFER_SIZE:
+            self._flush_buffer()
+        return True
+
+    def __len__(self):
+        return self.count
+
+    # ---------- runs ----------
+
+    def _flush_buffer(self):
+        if not self.buffer:
+            return
+        run = np.array(sorted(self.buffer), dtype=self.dtype)
+        self.buffer = set()
+        self.memory_runs.append(run)
+        # keep run sizes geometric so lookups touch O(log n) runs
+        while len(self.memory_runs) > 1 and len(self.memory_runs[-2]) <= 2 * len(self.memory_runs[-1]):
+            b = self.memory_runs.pop()
+            a = self.memory_runs.pop()
+            merged = np.concatenate([a, b])
+            merged.sort(kind="mergesort")
+            self.memory_runs.append(merged)
+        if sum(r.nbytes for r in self.memory_runs) > self.memory_budget:
+            self._spill()
+        self._refresh_runs()
+
+    def _refresh_runs(self):
+        self.runs = self.memory_runs + [m for _, m in self.disk_runs]
+
+    def _spill(self):
+        """Merge the in-memory runs into one sorted file-backed run."""
+        if not self.memory_runs:
+            return
+        merged = np.concatenate(self.memory_runs)
+        merged.sort(kind="mergesort")
+        self.memory_runs = []
+        if self.path is None:
+            # no store directory: an anonymous temp run still frees RSS
+            self.path = Path(tempfile.mkdtemp(prefix="dedupe_"))
+            self._temporary = True
+        self.path.mkdir(parents=True, exist_ok=True)
+        name = f"run_{len(self.disk_runs):05d}.npy"
+        np.save(self.path / name, merged)
+        self.disk_runs.append((name, np.load(self.path / name, mmap_mode="r")))
+        self._refresh_runs()
+
+    def _load(self):
+        manifest = self.path / MANIFEST
+        if not manifest.exists():
+            return
+        with manifest.open() as f:
+            meta = json.load(f)
+        if meta["bits"] != self.bits:
+            raise ValueError(f"{self.path} holds {meta['bits']}-bit digests, not {self.bits}")
+        if meta.get("key_version", 1) != KEY_VERSION:
+            raise ValueError(f"{self.path} was written with key version {meta.get('key_version', 1)}, not {KEY_VERSION}")
+        for name in meta["runs"]:
+            self.disk_runs.append((name, np.load(self.path / name, mmap_mode="r")))
+        self.count = meta["count"]
+        self._refresh_runs()
+
+    def close(self):
+        """Persist (with a path) everything added so far; a path-less store is just dropped."""
+        if self._temporary:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        if self.path is None:
+            return
+        self._flush_buffer()
+        self._spill()
+        self.path.mkdir(parents=True, exist_ok=True)  # nothing spilled when no records were added
+        tmp = self.path / (MANIFEST + ".tmp")
+        with tmp.open("w") as f:
+            json.dump(
+                {
+                    "bits": self.bits,
+                    "key_version": KEY_VERSION,
+                    "count": self.count,
+                    "runs": [n for n, _ in self.disk_runs],
+                },
+                f,
+            )
+        os.replace(tmp, self.path / MANIFEST)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- scripts ----------
+
+    @classmethod
+    def for_output(cls, out_path, bits=64, memory_budget_mb=256):
+        """
+        Store for one ingestion script's output file. Sets .output_mode:
+        "w" normally, "a" when DEDUPE_STATE_DIR holds a store for an output
+        that still exists (incremental run).
+        """
+        out_path = Path(out_path)
+        state_dir = os.environ.get(STATE_DIR_ENV)
+        if not state_dir:
+            store = cls(None, bits, memory_budget_mb)
+            store.output_mode = "w"
+            return store
+
+        path = Path(state_dir) / out_path.stem
+        if not out_path.exists() and path.exists():
+            # output was deleted: the old store no longer describes it
+            shutil.rmtree(path)
+        elif stale_key_version(path):
+            print(f"{path} uses an old key format: rebuilding {out_path} from scratch")
+            shutil.rmtree(path)
+        store = cls(path, bits, memory_budget_mb)
+        store.output_mode = "a" if len(store) else "w"
+        if len(store):
+            print(f"Incremental run: {len(store)} records already in {out_path}, appending new ones")
+        return store
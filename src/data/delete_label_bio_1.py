@@ -1,11 +1,14 @@
 from pathlib import Path
-import json
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 import kagglehub
 
 
+from jsonl_io import write_df_jsonl
+from parquet_io import emit_parquet
+
+
 PROCESSED_DIR = Path("data/processed")
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -14,13 +17,11 @@ OUT_PATH = PROCESSED_DIR / "label_bio_1.jsonl"  # Complete dataset for K-fold
 
 def write_jsonl(df: pd.DataFrame, path: Path):
     """Save DataFrame with columns ['text', 'label'] to JSONL."""
-    with path.open("w", encoding="utf-8") as f:
-        for _, row in df.iterrows():
-            rec = {
-                "text": str(row["text"]).strip(),
-                "label": str(row["label"]).strip(),
-            }
-            f.write(json.dumps(rec) + "\n")
+    out = pd.DataFrame({
+        "text": df["text"].astype(str).str.strip(),
+        "label": df["label"].astype(str).str.strip(),
+    })
+    write_df_jsonl(out, path)
     print(f"✅ Wrote {len(df)} rows to {path}")
 
 
@@ -76,6 +77,7 @@ def main(test_size: float = 0.1, random_state: int = 42):
 
     # Output complete dataset (no train/val split for K-fold cross-validation)
     write_jsonl(df, OUT_PATH)
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"🎉 Finished! Total {len(df)} doctor review samples → {OUT_PATH}")
 
 
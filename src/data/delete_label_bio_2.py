@@ -1,11 +1,14 @@
 from pathlib import Path
-import json
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from datasets import load_dataset
 
 
+from jsonl_io import write_df_jsonl
+from parquet_io import emit_parquet
+
+
 PROCESSED_DIR = Path("data/processed")
 PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -14,13 +17,11 @@ OUT_PATH = PROCESSED_DIR / "label_bio_2.jsonl"  # Complete dataset
 
 def write_jsonl(df: pd.DataFrame, path: Path):
     """Save DataFrame with columns ['text', 'label'] to JSONL."""
-    with path.open("w", encoding="utf-8") as f:
-        for _, row in df.iterrows():
-            rec = {
-                "text": str(row["text"]).strip(),
-                "label": str(row["label"]).strip(),
-            }
-            f.write(json.dumps(rec) + "\n")
+    out = pd.DataFrame({
+        "text": df["text"].astype(str).str.strip(),
+        "label": df["label"].astype(str).str.strip(),
+    })
+    write_df_jsonl(out, path)
     print(f"✅ Wrote {len(df)} rows to {path}")
 
 
@@ -63,6 +64,7 @@ def main():
 
     # Output complete dataset
     write_jsonl(df, OUT_PATH)
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"🎉 Finished! Total {len(df)} Shekswess samples → {OUT_PATH}")
 
 
@@ -0,0 +1,147 @@
+"""
+Shared JSONL reading / writing for the src/data scripts.
+
+  read_jsonl(path)              iterator of dicts, parsed in line batches
+  read_jsonl(path, workers=4)   same, batches parsed in a process pool (order kept)
+  read_jsonl_df(path)           pandas DataFrame
+  write_jsonl(records, path)    buffered writer for an iterable of dicts
+  write_df_jsonl(df, path, columns)
+                                vectorized DataFrame writer: every column is
+                                JSON-encoded once as a whole and the lines are
+                                assembled by string concatenation, no iterrows
+
+Parsing uses orjson when it is installed and the stdlib json module
+otherwise. Writing always uses the stdlib encoder so files stay byte-identical
+to the old `json.dumps(rec) + "\\n"` writers (same separators and ASCII
+escaping, or ensure_ascii=False where a script used that).
+
+Paths ending in .gz are gzip-compressed, .zst zstd-compressed (needs the
+optional zstandard package); everything else is plain text.
+
+Benchmark: python src/data/bench_jsonl_io.py data/processed/finance_combined.jsonl
+"""
+
+import gzip
+import io
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:  # optional fast parser
+    orjson = None
+
+
+BATCH_LINES = 8192
+WRITE_BUFFER_BYTES = 1 << 20
+
+
+def open_text(path, mode="r"):
+    """Open a (possibly .gz / .zst compressed) text file as UTF-8."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(f"Reading/writing {path} needs the zstandard package") from e
+        raw = path.open(mode + "b")
+        stream = (
+            zstandard.ZstdDecompressor().stream_reader(raw)
+            if mode == "r"
+            else zstandard.ZstdCompressor().stream_writer(raw)
+        )
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+def loads(line):
+    if orjson is None:
+        return json.loads(line)
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError:
+        # NaN / Infinity, which json.dumps writes and orjson rejects
+        return json.loads(line)
+
+
+def parse_lines(lines):
+    return [loads(line) for line in lines if line.strip()]
+
+
+def iter_line_batches(path, batch_lines=BATCH_LINES):
+    with open_text(path) as f:
+        while True:
+            batch = list(itertools.islice(f, batch_lines))
+            if not batch:
+                return
+            yield batch
+
+
+def read_jsonl(path, workers=1, batch_lines=BATCH_LINES):
+    """Yield one dict per non-empty line, in file order."""
+    batches = iter_line_batches(path, batch_lines)
+    if workers <= 1:
+        for batch in batches:
+            yield from parse_lines(batch)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        for parsed in pool.map(parse_lines, batches):
+            yield from parsed
+
+
+def read_jsonl_df(path, workers=1):
+    import pandas as pd
+
+    return pd.DataFrame(list(read_jsonl(path, workers)))
+
+
+def json_encoder(ensure_ascii=True):
+    # same output as json.dumps(obj) / json.dumps(obj, ensure_ascii=False)
+    return json.JSONEncoder(ensure_ascii=ensure_ascii).encode
+
+
+def write_lines(lines, path, append=False):
+    """Write already-encoded lines (without newline) in ~1MB chunks; returns the count."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    buf, size = [], 0
+    with open_text(path, "a" if append else "w") as f:
+        for line in lines:
+            buf.append(line)
+            size += len(line) + 1
+            n += 1
+            if size >= WRITE_BUFFER_BYTES:
+                f.write("\n".join(buf) + "\n")
+                buf, size = [], 0
+        if buf:
+            f.write("\n".join(buf) + "\n")
+    return n
+
+
+def write_jsonl(records, path, ensure_ascii=True, append=False):
+    """Write an iterable of dicts; returns the number of rows written."""
+    encode = json_encoder(ensure_ascii)
+    return write_lines(map(encode, records), path, append)
+
+
+def encode_df_lines(df, columns, ensure_ascii=True):
+    """JSON lines for df[columns], identical to json.dumps({c: row[c] ...}) per row."""
+    encode = json_encoder(ensure_ascii)
+    lines = None
+    for i, col in enumerate(columns):
+        values = df[col].tolist()  # numpy scalars -> Python ints/floats/str
+        prefix = ("{" if i == 0 else ", ") + encode(col) + ": "
+        encoded = [prefix + encode(v) for v in values]
+        lines = encoded if lines is None else [a + b for a, b in zip(lines, encoded)]
+    return [line + "}" for line in lines or []]
+
+
+def write_df_jsonl(df, path, columns=None, ensure_ascii=True, append=False):
+    """Vectorized DataFrame -> JSONL; returns the number of rows written."""
+    columns = list(columns or df.columns)
+    return write_lines(encode_df_lines(df, columns, ensure_ascii), path, append)
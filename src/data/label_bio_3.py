@@ -1,8 +1,13 @@
 from pathlib import Path
-import json
 import re
+import shutil
+import numpy as np
 import pandas as pd
-from typing import Optional
+
+from csv_io import csv_columns, iter_csv_chunks
+from dedupe_store import DedupeStore
+from jsonl_io import write_df_jsonl
+from parquet_io import emit_parquet
 
 
 # --------- Paths ---------
@@ -27,7 +32,7 @@ DROP_CONTRAST = False     # set True to drop mixed-sentiment "but/however" style
 SCALE_1_TO_5 = False      # set True only if the ratings are 1..5
 
 
-CONTRAST_RE = re.compile(r"\b(but|however|although|though|yet|nevertheless)\b", re.IGNORECASE)
+CONTRAST_RE = re.compile(r"\b(?:but|however|although|though|yet|nevertheless)\b", re.IGNORECASE)
 
 
 def download_drug_reviews_if_needed():
@@ -53,11 +58,11 @@ def download_drug_reviews_if_needed():
         raise FileNotFoundError("No CSV found inside downloaded Kaggle dataset folder.")
 
     # Copy the first CSV found into RAW_CSV path
-    RAW_CSV.write_bytes(csvs[0].read_bytes())
+    shutil.copyfile(csvs[0], RAW_CSV)
     print(f"✅ Copied {csvs[0].name} → {RAW_CSV}")
 
 
-def map_rating_to_label(r: float) -> Optional[str]:
+def map_rating_to_label(r: pd.Series) -> pd.Series:
     """
     Strong-label mapping to reduce noise:
       negative: 1-3
@@ -65,39 +70,27 @@ def map_rating_to_label(r: float) -> Optional[str]:
       positive: 8-10
     Drop ambiguous ratings 4 and 7.
 
-    Returns:
+    Returns (per rating):
       "0" for negative, "1" for neutral, "2" for positive, or None to drop.
     """
     if SCALE_1_TO_5:
         # Convert 1..5 into something comparable:
         # 1-2 -> neg, 3 -> neutral, 4-5 -> pos
-        if r in (1, 2):
-            return "0"
-        if r == 3:
-            return "1"
-        if r in (4, 5):
-            return "2"
-        return None
-
-    # 1..10 scale
-    if 1 <= r <= 3:
-        return "0"
-    if 5 <= r <= 6:
-        return "1"
-    if 8 <= r <= 10:
-        return "2"
-    return None  # drop 4 and 7 (and anything weird)
-
-
-def count_tokens(text: str) -> int:
+        conditions = [r.isin([1, 2]), r == 3, r.isin([4, 5])]
+    else:
+        # 1..10 scale
+        conditions = [r.between(1, 3), r.between(5, 6), r.between(8, 10)]
+    labels = np.select(conditions, ["0", "1", "2"], default=None)
+    return pd.Series(labels, index=r.index, dtype=object)  # None: drop 4 and 7 (and anything weird)
+
+
+def count_tokens(text: pd.Series) -> pd.Series:
     # simple whitespace token count (good enough for filtering)
-    return len(text.split())
+    return text.str.split().str.len()
 
 
 def write_jsonl(df: pd.DataFrame, path: Path):
-    with path.open("w", encoding="utf-8") as f:
-        for _, row in df.iterrows():
-            f.write(json.dumps({"text": row["text"], "label": row["label"]}) + "\n")
+    write_df_jsonl(df, path, ["text", "label"])
     print(f"✅ Wrote {len(df)} rows → {path}")
 
 
@@ -135,59 +128,70 @@ def main(random_state: int = 42):
     download_drug_reviews_if_needed()
 
     print(f"📄 Loading: {RAW_CSV}")
-    df = pd.read_csv(RAW_CSV)
-    print("Columns:", list(df.columns))
+    columns = csv_columns(RAW_CSV)
+    print("Columns:", columns)
 
     # Identify text + rating columns
-    if "Reviews" not in df.columns:
+    if "Reviews" not in columns:
         raise ValueError("Expected a 'Reviews' column.")
     rating_col = "Rating"
-    if rating_col not in df.columns:
+    if rating_col not in columns:
         # fallback for datasets that call it Satisfaction
-        if "Satisfaction" in df.columns:
+        if "Satisfaction" in columns:
             rating_col = "Satisfaction"
         else:
             raise ValueError("Expected a 'Rating' (or 'Satisfaction') column.")
 
-    df = df[["Reviews", rating_col]].copy()
-    df = df.dropna(subset=["Reviews", rating_col])
-
-    df["rating"] = pd.to_numeric(df[rating_col], errors="coerce")
-    df = df.dropna(subset=["rating"])
-
-    # normalize text
-    df["text"] = df["Reviews"].astype(str).str.strip()
-
-    # map rating -> label, dropping ambiguous
-    df["label"] = df["rating"].apply(map_rating_to_label)
-    before = len(df)
-    df = df[df["label"].notna()].copy()
-    print(f"🧹 Dropped {before - len(df)} rows due to ambiguous ratings.")
-
-    # length filtering
-    df["tok_len"] = df["text"].apply(count_tokens)
-    before = len(df)
-    df = df[(df["tok_len"] >= MIN_TOKENS) & (df["tok_len"] <= MAX_TOKENS)].copy()
-    print(f"🧹 Dropped {before - len(df)} rows due to token-length filter [{MIN_TOKENS}, {MAX_TOKENS}].")
-
-    # optional contrast filtering
+    # clean chunk by chunk; only the kept (text, label) rows stay in memory
+    parts = []
+    dropped = {"ambiguous": 0, "length": 0, "contrast": 0, "duplicate": 0}
+    with DedupeStore() as seen:
+        for chunk in iter_csv_chunks(RAW_CSV, usecols=["Reviews", rating_col]):
+            chunk = chunk.dropna(subset=["Reviews", rating_col])
+
+            chunk = chunk.assign(rating=pd.to_numeric(chunk[rating_col], errors="coerce"))
+            chunk = chunk.dropna(subset=["rating"])
+
+            # normalize text
+            text = chunk["Reviews"].astype(str).str.strip()
+
+            # map rating -> label, dropping ambiguous
+            label = map_rating_to_label(chunk["rating"])
+            keep = label.notna()
+            dropped["ambiguous"] += int((~keep).sum())
+            text, label = text[keep], label[keep]
+
+            # length filtering
+            tok_len = count_tokens(text)
+            keep = (tok_len >= MIN_TOKENS) & (tok_len <= MAX_TOKENS)
+            dropped["length"] += int((~keep).sum())
+            text, label = text[keep], label[keep]
+
+            # optional contrast filtering
+            if DROP_CONTRAST:
+                keep = ~text.str.contains(CONTRAST_RE, regex=True)
+                dropped["contrast"] += int((~keep).sum())
+                text, label = text[keep], label[keep]
+
+            # drop duplicates (first occurrence in file order wins)
+            keep = np.fromiter((seen.add(t) for t in text), dtype=bool, count=len(text))
+            dropped["duplicate"] += int((~keep).sum())
+            parts.append(pd.DataFrame({"text": text[keep], "label": label[keep]}))
+
+    df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame({"text": [], "label": []})
+    print(f"🧹 Dropped {dropped['ambiguous']} rows due to ambiguous ratings.")
+    print(f"🧹 Dropped {dropped['length']} rows due to token-length filter [{MIN_TOKENS}, {MAX_TOKENS}].")
     if DROP_CONTRAST:
-        before = len(df)
-        df = df[~df["text"].str.contains(CONTRAST_RE, regex=True)].copy()
-        print(f"🧹 Dropped {before - len(df)} rows due to contrast-word filter.")
-
-    # drop duplicates
-    before = len(df)
-    df = df.drop_duplicates(subset=["text"])
-    print(f"🧹 Dropped {before - len(df)} duplicate texts.")
+        print(f"🧹 Dropped {dropped['contrast']} rows due to contrast-word filter.")
+    print(f"🧹 Dropped {dropped['duplicate']} duplicate texts.")
 
     print("✅ Label distribution (cleaned):\n", df["label"].value_counts())
 
     # stratified subsample
-    df = df[["text", "label"]].reset_index(drop=True)
     df_sub = stratified_subsample(df, MAX_SAMPLES, random_state=random_state)
 
     write_jsonl(df_sub, OUT_PATH)
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"🎉 Done: {len(df_sub)} samples saved to {OUT_PATH}")
 
 
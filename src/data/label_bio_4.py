@@ -1,32 +1,30 @@
 from pathlib import Path
-import json
-import re
-import csv
+import shutil
 import kagglehub
+import numpy as np
+import pandas as pd
+
+from csv_io import csv_columns, iter_csv_chunks
+from dedupe_store import DedupeStore
+from jsonl_io import encode_df_lines
+from parquet_io import emit_parquet
+from text_norm import WHITESPACE_RE
 
 RAW_DIR = Path("data/raw/bio")
 OUT_PATH = Path("data/processed/label_bio_4.jsonl")
 
 
-def normalize(text: str) -> str:
-    text = re.sub(r"\s+", " ", str(text))
-    return text.strip()
-
+def normalize(text: pd.Series) -> pd.Series:
+    return text.str.replace(WHITESPACE_RE, " ", regex=True).str.strip()
 
-def rating_to_label(rating):
-    """Map 1–5 ratings to negative/neutral/positive sentiment labels."""
-    try:
-        r = int(rating)
-    except (TypeError, ValueError):
-        return None
 
-    if r in (1, 2):
-        return "negative"
-    if r == 3:
-        return "neutral"
-    if r in (4, 5):
-        return "positive"
-    return None
+def rating_to_label(rating: pd.Series) -> pd.Series:
+    """Map 1–5 ratings to negative/neutral/positive sentiment labels (None if not an integer 1–5)."""
+    # int(rating) semantics: surrounding whitespace is fine, "4.0" / "" are not ratings
+    r = rating.str.strip()
+    r = r.where(r.str.fullmatch(r"[+-]?\d+(?:_\d+)*", na=False)).map(int, na_action="ignore")
+    labels = np.select([r.isin([1, 2]), r == 3, r.isin([4, 5])], ["negative", "neutral", "positive"], default=None)
+    return pd.Series(labels, index=rating.index, dtype=object)
 
 
 def download_if_needed():
@@ -47,7 +45,7 @@ def download_if_needed():
         num_copied = 0
         for file in Path(path).rglob("*.csv"):
             target = RAW_DIR / file.name
-            target.write_bytes(file.read_bytes())
+            shutil.copyfile(file, target)
             num_copied += 1
 
         print(f"Copied {num_copied} CSV file(s) to {RAW_DIR}")
@@ -56,7 +54,7 @@ def download_if_needed():
 
 
 def iter_reviews():
-    """Yield (text, label) pairs from hospital CSV files in RAW_DIR."""
+    """Yield DataFrames of (text, label) from hospital CSV files in RAW_DIR, chunk by chunk."""
     csv_files = list(RAW_DIR.glob("*hospital*.csv"))
     if not csv_files:
         print(f"Warning: No hospital CSV files found in {RAW_DIR}")
@@ -65,47 +63,28 @@ def iter_reviews():
     for p in csv_files:
         print("Reading:", p)
         try:
-            with p.open("r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                # Print first row to debug column names
-                first_row = next(reader, None)
-                if first_row:
-                    print(f"Columns found: {list(first_row.keys())}")
-                    # Try different possible column names
-                    text_col = None
-                    rating_col = None
-                    
-                    for col in first_row.keys():
-                        if col.lower() in ['feedback', 'review', 'text', 'comment']:
-                            text_col = col
-                        if col.lower() in ['ratings', 'rating', 'score']:
-                            rating_col = col
-                    
-                    if not text_col or not rating_col:
-                        print(f"Warning: Could not find text/rating columns in {p}")
-                        continue
-                    
-                    # Process first row
-                    text = normalize(first_row.get(text_col, ""))
-                    rating = first_row.get(rating_col)
-                    if text and len(text) >= 5:
-                        label = rating_to_label(rating)
-                        if label is not None:
-                            yield text, label
-                    
-                    # Process remaining rows
-                    for row in reader:
-                        text = normalize(row.get(text_col, ""))
-                        rating = row.get(rating_col)
-
-                        if not text or len(text) < 5:
-                            continue
-
-                        label = rating_to_label(rating)
-                        if label is None:
-                            continue
-
-                        yield text, label
+            columns = csv_columns(p)
+            print(f"Columns found: {columns}")
+            # Try different possible column names
+            text_col = None
+            rating_col = None
+
+            for col in columns:
+                if col.lower() in ['feedback', 'review', 'text', 'comment']:
+                    text_col = col
+                if col.lower() in ['ratings', 'rating', 'score']:
+                    rating_col = col
+
+            if not text_col or not rating_col:
+                print(f"Warning: Could not find text/rating columns in {p}")
+                continue
+
+            # values stay plain strings, and rows with missing / extra fields are kept, as with csv.DictReader
+            for chunk in iter_csv_chunks(p, usecols=[text_col, rating_col], keep_default_na=False, ragged=True):
+                text = normalize(chunk[text_col].fillna(""))
+                label = rating_to_label(chunk[rating_col])
+                keep = (text.str.len() >= 5) & label.notna()
+                yield pd.DataFrame({"text": text[keep], "label": label[keep]})
         except Exception as e:
             print(f"Error reading {p}: {e}")
             continue
@@ -117,16 +96,15 @@ def main():
 
     download_if_needed()
 
-    seen = set()
     n = 0
-    with OUT_PATH.open("w", encoding="utf-8") as w:
-        for text, label in iter_reviews():
-            if text in seen:
-                continue
-            seen.add(text)
-            w.write(json.dumps({"text": text, "label": label}) + "\n")
-            n += 1
-
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
+        for chunk in iter_reviews():
+            new = np.fromiter((seen.add(t) for t in chunk["text"]), dtype=bool, count=len(chunk))
+            for line in encode_df_lines(chunk[new], ["text", "label"]):
+                w.write(line + "\n")
+            n += int(new.sum())
+
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"Wrote {n} examples → {OUT_PATH}")
 
 
@@ -7,15 +7,12 @@ FIQA结构: instruction + input (作为主要text), output (作为label)
 
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
-OUT_PATH = Path("data/processed/label_financial_1.jsonl")
+from dedupe_store import DedupeStore
+from text_norm import normalize
 
-def normalize(text: str) -> str:
-    """Normalize whitespace and strip."""
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+OUT_PATH = Path("data/processed/label_financial_1.jsonl")
 
 
 def main():
@@ -24,10 +21,9 @@ def main():
     
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     
-    seen = set()
     count = 0
     
-    with OUT_PATH.open("w", encoding="utf-8") as f:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as f:
         # Process all splits
         for split in dataset:
             print(f"  Processing split: {split}")
@@ -56,11 +52,9 @@ def main():
                     continue
                 
                 # Deduplication
-                if text in seen:
+                if not seen.add(text):
                     continue
                 
-                seen.add(text)
-                
                 # Write with label preserved
                 output_row = {
                     "text": text,
@@ -11,19 +11,16 @@ LABEL_MAP = {
 
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
 RAW_DIR = Path("data/raw/financial")
 OUT_PATH = Path("data/processed/label_financial_2.jsonl")
 
 
-def normalize(text: str) -> str:
-    text = text.replace("\n", " ")
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
-
 def download_finance_if_needed():
     """
     Download zeroshot/twitter-financial-news-sentiment dataset via HuggingFace.
@@ -84,14 +81,12 @@ def main():
 
     download_finance_if_needed()
 
-    seen = set()
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
         for text, label in iter_texts_from_finance():
-            key = (text, label)
-            if key not in seen:
-                seen.add(key)
+            if seen.add(text, label):
                 w.write(json.dumps({"text": text, "label": label}) + "\n")
 
+    emit_parquet(OUT_PATH, domain="FIN")
     print("Finished preprocessing →", OUT_PATH)
 
 
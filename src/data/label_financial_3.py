@@ -11,9 +11,12 @@ LABEL_MAP = {
 
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
 RAW_DIR = Path("data/raw/financial")
 OUT_PATH = Path("data/processed/label_financial_3.jsonl")
 
@@ -23,12 +26,6 @@ LABEL_MAP = {
     "positive": 2
 }
 
-def normalize(text: str) -> str:
-    if not isinstance(text, str):
-        return ""
-    text = text.replace("\n", " ")
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
 
 def download_investing_if_needed():
     """
@@ -99,16 +96,14 @@ def main():
 
     download_investing_if_needed()
 
-    seen = set()
     count = 0
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
         for text, label in iter_texts_from_phrasebank():
-            key = (text, label)
-            if key not in seen:
-                seen.add(key)
+            if seen.add(text, label):
                 w.write(json.dumps({"text": text, "label": label}) + "\n")
                 count += 1
 
+    emit_parquet(OUT_PATH, domain="FIN")
     print(f"✅ Finished! Wrote {count} samples → {OUT_PATH}")
 
 
@@ -0,0 +1,199 @@
+"""
+Train / eval leakage check across all split files in data/processed.
+
+split_train_test.py, split.py and merged_data.py each draw splits from
+overlapping pools, so a test sentence of one split can sit in the train
+file of another (e.g. bio_test vs mixed_balanced_train). Every text is
+hashed two ways
+
+  exact       the text as stored
+  normalized  casefolded, punctuation dropped, whitespace collapsed
+
+and one index of (64-bit digest, train file) pairs, sorted once, is built in
+a single pass over all train files. Each eval file is then streamed once in
+chunks and looked up against it (np.searchsorted), and every hit is credited
+to the train files that hold the text. The report gives, for every
+(train file, eval file) pair, how many eval records also occur in the train
+file. Only the texts shown as examples are kept, so memory is the index plus
+one chunk.
+
+Split files are recognised by name: *train* is train, *val* / *test* /
+*eval* is eval. --fail_on_leak exits with code 1 when any pair overlaps
+(above --max_overlap), so a pipeline can stop on it.
+
+Usage:
+    python src/data/leakage.py --data_dir data/processed --report leakage_report.json --fail_on_leak
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+KINDS = ("exact", "normalized")
+CHUNK_LINES = 1 << 16
+
+TRAIN_RE = re.compile(r"train", re.IGNORECASE)
+EVAL_RE = re.compile(r"val|test|eval", re.IGNORECASE)
+PUNCT_RE = re.compile(r"[^\w\s]")
+SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop punctuation, collapse whitespace."""
+    text = PUNCT_RE.sub(" ", str(text).casefold())
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def digest64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def iter_text_chunks(path, chunk_lines=CHUNK_LINES):
+    chunk = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                chunk.append(json.loads(line).get("text", ""))
+                if len(chunk) == chunk_lines:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def digests(texts):
+    """{kind: uint64 digest per text}."""
+    return {
+        "exact": np.fromiter((digest64(str(t)) for t in texts), dtype=np.uint64, count=len(texts)),
+        "normalized": np.fromiter((digest64(normalize(t)) for t in texts), dtype=np.uint64, count=len(texts)),
+    }
+
+
+class TrainIndex:
+    """Sorted, distinct (digest, train file id) pairs of all train files, per kind."""
+
+    def __init__(self, paths):
+        self.names = [Path(p).name for p in paths]
+        keys = {k: [] for k in KINDS}
+        files = {k: [] for k in KINDS}
+        for file_id, path in enumerate(paths):
+            for texts in iter_text_chunks(path):
+                for kind, d in digests(texts).items():
+                    keys[kind].append(d)
+                    files[kind].append(np.full(len(d), file_id, dtype=np.int32))
+
+        self.keys, self.files = {}, {}
+        for kind in KINDS:
+            k = np.concatenate(keys[kind]) if keys[kind] else np.empty(0, dtype=np.uint64)
+            f = np.concatenate(files[kind]) if files[kind] else np.empty(0, dtype=np.int32)
+            order = np.lexsort((f, k))
+            k, f = k[order], f[order]
+            distinct = np.ones(len(k), dtype=bool)
+            distinct[1:] = (k[1:] != k[:-1]) | (f[1:] != f[:-1])
+            self.keys[kind], self.files[kind] = k[distinct], f[distinct]
+
+    def hits(self, kind, keys):
+        """(query row, train file id) for every train file that holds each query digest."""
+        lo = np.searchsorted(self.keys[kind], keys, "left")
+        counts = np.searchsorted(self.keys[kind], keys, "right") - lo
+        rows = np.repeat(np.arange(len(keys)), counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return rows, self.files[kind][np.repeat(lo, counts) + offsets]
+
+
+def classify(paths):
+    train, evals = [], []
+    for p in sorted(paths):
+        stem = Path(p).stem
+        if TRAIN_RE.search(stem):
+            train.append(p)
+        elif EVAL_RE.search(stem):
+            evals.append(p)
+    return train, evals
+
+
+def eval_overlap(path, index, num_examples=3):
+    """Stream one eval file against the train index: one report pair per train file."""
+    n_train = len(index.names)
+    counts = {k: np.zeros(n_train, dtype=np.int64) for k in KINDS}
+    examples = {k: [[] for _ in range(n_train)] for k in KINDS}
+    n = 0
+    for texts in iter_text_chunks(path):
+        for kind, keys in digests(texts).items():
+            rows, files = index.hits(kind, keys)
+            counts[kind] += np.bincount(files, minlength=n_train)
+            for f in np.unique(files):
+                kept = examples[kind][f]
+                if len(kept) < num_examples:
+                    kept.extend(texts[i] for i in rows[files == f][: num_examples - len(kept)])
+        n += len(texts)
+
+    def overlap(kind, f):
+        return {
+            "count": int(counts[kind][f]),
+            "fraction": float(counts[kind][f] / n) if n else 0.0,
+            "examples": examples[kind][f],
+        }
+
+    pairs = []
+    for f, name in enumerate(index.names):
+        pairs.append({"train": name, "eval": Path(path).name, "eval_size": n, **{k: overlap(k, f) for k in KINDS}})
+    return pairs
+
+
+def leakage_report(train_paths, eval_paths, num_examples=3):
+    index = TrainIndex(train_paths)
+    return [pair for path in eval_paths for pair in eval_overlap(path, index, num_examples)]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Exact / normalized text overlap between train and eval splits")
+    parser.add_argument("--data_dir", type=str, default="data/processed")
+    parser.add_argument("--files", nargs="*", default=None, help="Split files to check (default: all *.jsonl in data_dir)")
+    parser.add_argument("--report", type=str, default=None, help="Write the full report as JSON")
+    parser.add_argument("--num_examples", type=int, default=3)
+    parser.add_argument("--fail_on_leak", action="store_true", help="Exit 1 if any pair overlaps")
+    parser.add_argument("--max_overlap", type=float, default=0.0, help="Tolerated normalized-overlap fraction")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = args.files or [str(p) for p in Path(args.data_dir).glob("*.jsonl")]
+    train_paths, eval_paths = classify(paths)
+    if not train_paths or not eval_paths:
+        print(f"Nothing to compare: {len(train_paths)} train / {len(eval_paths)} eval split files")
+        return
+
+    print(f"Indexing {len(train_paths)} train files, checking {len(eval_paths)} eval files...")
+    pairs = leakage_report(train_paths, eval_paths, args.num_examples)
+
+    leaks = [p for p in pairs if p["normalized"]["count"] and p["normalized"]["fraction"] > args.max_overlap]
+    for p in pairs:
+        if p["normalized"]["count"]:
+            print(
+                f"  {p['eval']:<35} ∩ {p['train']:<35} exact={p['exact']['count']:>6} "
+                f"normalized={p['normalized']['count']:>6} ({p['normalized']['fraction']:.2%} of {p['eval_size']})"
+            )
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"pairs": pairs, "leaking_pairs": len(leaks)}, f, ensure_ascii=False, indent=2)
+        print(f"Saved report → {args.report}")
+
+    if not leaks:
+        print("✅ No train/eval overlap found.")
+        return
+    print(f"⚠️  {len(leaks)} train/eval pairs overlap.")
+    if args.fail_on_leak:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
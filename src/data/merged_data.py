@@ -1,7 +1,9 @@
 from pathlib import Path
-import json
 import pandas as pd
 
+from jsonl_io import read_jsonl, write_df_jsonl
+from parquet_io import emit_parquet, infer_domain
+
 # -----------------------------
 # Paths
 # -----------------------------
@@ -25,17 +27,15 @@ def validate_label(label):
 
 def load_jsonl(path, source_name):
     rows = []
-    with path.open() as f:
-        for line in f:
-            obj = json.loads(line)
-            text = obj.get("text", "").strip()
-            label = validate_label(obj.get("label"))
-
-            rows.append({
-                "text": text,
-                "label": label,
-                "source": source_name
-            })
+    for obj in read_jsonl(path):
+        text = obj.get("text", "").strip()
+        label = validate_label(obj.get("label"))
+
+        rows.append({
+            "text": text,
+            "label": label,
+            "source": source_name
+        })
     return pd.DataFrame(rows)
 
 
@@ -59,13 +59,10 @@ def main():
     df = df.sample(frac=1, random_state=42).reset_index(drop=True)
 
     # Write combined jsonl
-    with OUT.open("w", encoding="utf-8") as f:
-        for _, row in df.iterrows():
-            f.write(json.dumps({
-                "text": row["text"],
-                "label": row["label"],
-                "source": row["source"]
-            }) + "\n")
+    write_df_jsonl(df, OUT, ["text", "label", "source"])
+    # "FIN" when both inputs are financial (finance_combined); a BIO + FIN mix has no single domain
+    domains = {infer_domain(FILE1), infer_domain(FILE2)}
+    emit_parquet(OUT, domain=domains.pop() if len(domains) == 1 else None)
 
     print(f"✅ Saved merged dataset with numeric labels to {OUT}")
 
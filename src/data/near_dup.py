@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection with MinHash + banded LSH.
+
+The ingestion scripts only drop exact duplicates (after normalize()); news
+rewrites and retweets that differ by a word or a link still get through. This
+index drops records whose estimated Jaccard similarity of word shingles to an
+already kept record is >= --threshold.
+
+Records are processed in one pass, in input order: each one is looked up in
+the LSH buckets of the records kept so far (candidate pairs only, no all-pairs
+comparison), verified on the full signature, then either dropped into the
+matching record's cluster or kept and indexed. The first occurrence of a
+cluster is the one kept, like the scripts' `seen` sets.
+
+Across files (default) one index is shared, so a headline in
+unlabel_financial_2.jsonl that was already kept from unlabel_financial_1.jsonl
+is dropped; with --per_file every file is deduplicated on its own.
+
+Usage:
+    python src/data/near_dup.py data/processed/unlabel_financial_1.jsonl \
+        data/processed/unlabel_financial_2.jsonl --threshold 0.8 \
+        --output_dir data/processed/near_dedup --report data/processed/near_dedup/clusters.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str, k: int):
+    """Lower-cased word k-grams; texts shorter than k words become one shingle."""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+
+
+def optimal_bands(threshold: float, num_perm: int):
+    """
+    (bands, rows) with bands * rows <= num_perm minimizing the false-positive +
+    false-negative probability mass around the threshold (as in datasketch).
+    """
+    xs = np.linspace(0.0, 1.0, 201)
+    best, best_err = (1, num_perm), float("inf")
+    for b in range(1, num_perm + 1):
+        for r in range(1, num_perm // b + 1):
+            p = 1.0 - (1.0 - xs ** r) ** b  # probability that a pair at similarity x collides
+            fp = np.trapz(np.where(xs < threshold, p, 0.0), xs)
+            fn = np.trapz(np.where(xs >= threshold, 1.0 - p, 0.0), xs)
+            if fp + fn < best_err:
+                best, best_err = (b, r), fp + fn
+    return best
+
+
+class MinHashLSH:
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=3, seed=1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self.buckets = [defaultdict(list) for _ in range(self.bands)]
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.ids = []  # external id of every kept record, by row in self.signatures
+
+    def signature(self, text: str) -> np.ndarray:
+        hv = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+             for s in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        with np.errstate(over="ignore"):
+            phv = ((hv[:, None] * self.a + self.b) % MERSENNE_PRIME) & MAX_HASH
+        return phv.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sig):
+        return [sig[i * self.rows : (i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def query(self, sig):
+        """Best (kept id, estimated Jaccard) at or above the threshold, or None."""
+        candidates = set()
+        for bucket, key in zip(self.buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+        rows = np.fromiter(candidates, dtype=np.int64)
+        sims = (self.signatures[rows] == sig).mean(axis=1)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        return self.ids[rows[best]], float(sims[best])
+
+    def insert(self, sig, record_id):
+        row = len(self.ids)
+        if row == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        self.signatures[row] = sig
+        self.ids.append(record_id)
+        for bucket, key in zip(self.buckets, self._band_keys(sig)):
+            bucket[key].append(row)
+
+    def add(self, text, record_id):
+        """Keep the record (returns None) or return (cluster id, similarity) it duplicates."""
+        sig = self.signature(text)
+        match = self.query(sig)
+        if match is None:
+            self.insert(sig, record_id)
+        return match
+
+
+def dedupe_files(paths, output_dir, index_factory, per_file=False, report=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    index = None if per_file else index_factory()
+    clusters = defaultdict(int)
+
+    for path in map(Path, paths):
+        if per_file:
+            index = index_factory()
+        kept = dropped = 0
+        with path.open("r", encoding="utf-8") as f, (output_dir / path.name).open("w", encoding="utf-8") as w:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                record_id = f"{path.name}:{line_no}"
+                match = index.add(obj.get("text", ""), record_id)
+                if match is None:
+                    w.write(line if line.endswith("\n") else line + "\n")
+                    kept += 1
+                    continue
+                dropped += 1
+                clusters[match[0]] += 1
+                if report is not None:
+                    report.write(
+                        json.dumps({"dropped": record_id, "cluster": match[0], "similarity": round(match[1], 4)})
+                        + "\n"
+                    )
+        print(f"{path.name}: kept {kept}, dropped {dropped} near-duplicates → {output_dir / path.name}")
+
+    sizes = sorted(clusters.values(), reverse=True)
+    print(f"{len(sizes)} clusters with near-duplicates, {sum(sizes)} records dropped")
+    if sizes:
+        print("Largest clusters:", ", ".join(f"{k} (+{v})" for k, v in sorted(clusters.items(), key=lambda kv: -kv[1])[:5]))
+    return clusters
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="MinHash-LSH near-duplicate removal for JSONL corpora")
+    parser.add_argument("inputs", nargs="+", help="JSONL files with a 'text' field")
+    parser.add_argument("--output_dir", type=str, required=True, help="Deduplicated copies, same file names")
+    parser.add_argument("--report", type=str, default=None, help="JSONL of dropped record → kept cluster id")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Jaccard similarity to count as duplicate")
+    parser.add_argument("--num_perm", type=int, default=128)
+    parser.add_argument("--shingle_size", type=int, default=3, help="Words per shingle")
+    parser.add_argument("--per_file", action="store_true", help="Separate index per file instead of across files")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    def index_factory():
+        return MinHashLSH(args.threshold, args.num_perm, args.shingle_size, args.seed)
+
+    index = index_factory()
+    print(f"MinHash LSH: threshold={args.threshold}, {index.bands} bands x {index.rows} rows")
+
+    report = open(args.report, "w", encoding="utf-8") if args.report else None
+    try:
+        dedupe_files(args.inputs, args.output_dir, index_factory, args.per_file, report)
+    finally:
+        if report is not None:
+            report.close()
+
+
+if __name__ == "__main__":
+    main()
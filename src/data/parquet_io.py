@@ -0,0 +1,146 @@
+"""
+Parquet copies of the processed datasets, with one fixed schema:
+
+  text    string (not null)
+  label   int8            id from data/processed/label_map.json; null for MLM corpora
+  domain  dictionary      "BIO" / "FIN" (as in predict.DOMAIN_TOKENS), null if mixed
+  source  dictionary      where the record came from (defaults to the file stem)
+
+The JSONL files mix label types ("negative" in label_financial_2 / label_bio_4,
+2 in label_financial_3, "2" elsewhere); here every label is stored as its id,
+so files can be concatenated and fed to the trainers without per-file fixes.
+Names and ids are resolved through label_map.json, the same file
+finetune_sft.py reads, so the two cannot drift apart.
+Dictionary columns and zstd compression keep the files a fraction of the
+JSONL size, and finetune_sft.py / pretraining_mlm.py load .parquet directly
+(no JSON parsing on every run).
+
+The ingestion scripts still write their JSONL (the dedupe / incremental logic
+works on it) and, with EMIT_PARQUET=1 in the environment, also write
+<name>.parquet next to it:
+
+    EMIT_PARQUET=1 python src/data/pipeline.py
+
+Existing JSONL files can be converted with
+    python src/data/parquet_io.py data/processed/label_financial_*.jsonl
+"""
+
+import argparse
+import functools
+import itertools
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from jsonl_io import read_jsonl
+
+
+SCHEMA = pa.schema([
+    pa.field("text", pa.string(), nullable=False),
+    pa.field("label", pa.int8()),
+    pa.field("domain", pa.dictionary(pa.int8(), pa.string())),
+    pa.field("source", pa.dictionary(pa.int16(), pa.string())),
+])
+
+LABEL_MAP_PATH = Path(__file__).resolve().parents[2] / "data/processed/label_map.json"
+EMIT_ENV = "EMIT_PARQUET"
+BATCH_ROWS = 65536
+
+
+@functools.lru_cache(maxsize=None)
+def load_label_map(path=LABEL_MAP_PATH):
+    """{"negative": 0, ...} from label_map.json (name -> id)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return {name.lower(): int(i) for name, i in json.load(f).items()}
+
+
+def label_id(label, label2id=None):
+    """An id or a name from the label map ("2", 2, "positive") -> int id; None stays None."""
+    if label is None:
+        return None
+    label2id = label2id or load_label_map()
+    if isinstance(label, str):
+        label = label.strip()
+        if not label.isdigit():
+            if label.lower() not in label2id:
+                raise ValueError(f"Not a label in the label map: {label!r}")
+            return label2id[label.lower()]
+    label = int(label)
+    if label not in label2id.values():
+        raise ValueError(f"Label id not in the label map: {label}")
+    return label
+
+
+def infer_domain(path):
+    name = Path(path).name.lower()
+    if "bio" in name or "med" in name:
+        return "BIO"
+    if "fin" in name:
+        return "FIN"
+    return None
+
+
+def to_record_batch(records, domain=None, source=None, label2id=None):
+    """Records (dicts with text / label and optionally domain, source) -> a batch in SCHEMA."""
+    return pa.RecordBatch.from_pydict(
+        {
+            "text": [r["text"] for r in records],
+            "label": [label_id(r.get("label"), label2id) for r in records],
+            "domain": [r.get("domain") or domain for r in records],
+            "source": [r.get("source") or source for r in records],
+        },
+        schema=SCHEMA,
+    )
+
+
+def jsonl_to_parquet(jsonl_path, parquet_path=None, domain=None, source=None, compression="zstd", label2id=None):
+    """Stream a JSONL file into Parquet, BATCH_ROWS records per row group; returns (path, rows)."""
+    jsonl_path = Path(jsonl_path)
+    parquet_path = Path(parquet_path) if parquet_path else jsonl_path.with_suffix(".parquet")
+    source = source or jsonl_path.stem
+    records = read_jsonl(jsonl_path)
+    n = 0
+    with pq.ParquetWriter(parquet_path, SCHEMA, compression=compression) as writer:
+        while True:
+            chunk = list(itertools.islice(records, BATCH_ROWS))
+            if not chunk:
+                break
+            writer.write_batch(to_record_batch(chunk, domain, source, label2id))
+            n += len(chunk)
+    return parquet_path, n
+
+
+def emit_parquet(jsonl_path, domain=None, source=None):
+    """End-of-script hook: with EMIT_PARQUET=1, also write the output as <name>.parquet."""
+    if os.environ.get(EMIT_ENV, "") in ("", "0"):
+        return None
+    path, n = jsonl_to_parquet(jsonl_path, domain=domain, source=source)
+    print(f"Wrote {n} rows → {path}")
+    return path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert processed JSONL files to Parquet (fixed schema)")
+    parser.add_argument("inputs", nargs="+", help="JSONL files with 'text' (and 'label') fields")
+    parser.add_argument("--domain", type=str, default=None, help="BIO / FIN (default: from the file name)")
+    parser.add_argument("--source", type=str, default=None, help="Default: the file stem")
+    parser.add_argument("--compression", type=str, default="zstd")
+    parser.add_argument("--label_map", type=str, default=str(LABEL_MAP_PATH), help="Label name -> id JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    label2id = load_label_map(args.label_map)
+    for p in args.inputs:
+        path, n = jsonl_to_parquet(p, domain=args.domain or infer_domain(p), source=args.source,
+                                   compression=args.compression, label2id=label2id)
+        before, after = Path(p).stat().st_size, path.stat().st_size
+        print(f"{p}: {n} rows, {before / 1e6:.1f}MB → {path} {after / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
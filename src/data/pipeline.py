@@ -0,0 +1,297 @@
+"""
+Incremental, parallel runner for the Stage 1 (MLM) ingestion scripts.
+
+Replaces the body of process_all_mlm_data.sh, which deleted every
+unlabel_*.jsonl and ran the five scripts one after another. Each script is
+declared as a stage with its inputs and output; stages whose dependencies
+are done run concurrently in a process pool (each script via runpy, with
+its output captured in data/processed/.pipeline_logs/<stage>.log).
+
+A stage is skipped when nothing it depends on changed since its last
+successful run, as recorded in data/processed/.pipeline_state.json:
+  code     the script plus the src/data modules it imports (e.g. dedupe_store.py)
+  inputs   size + mtime of its local raw files, and its remote dataset ids
+  output   size + mtime of the output file (edited / deleted -> rerun)
+A stage that does run starts from a deleted output, like the old
+`rm -f data/processed/unlabel_*.jsonl`.
+
+Ordering: unlabel_bio_1 only downloads BioASQ while data/raw/bio is empty,
+and unlabel_bio_3 writes medical_text_raw.jsonl into that directory, so
+unlabel_bio_3 runs after unlabel_bio_1.
+
+Usage (from anywhere; paths are resolved against the repo root):
+    python src/data/pipeline.py                 # run what changed
+    python src/data/pipeline.py --force         # full rebuild
+    python src/data/pipeline.py --dry_run
+    python src/data/pipeline.py --stages unlabel_financial_1 unlabel_financial_2
+"""
+
+import argparse
+import ast
+import contextlib
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SCRIPT_DIR = Path("src/data")
+STATE_PATH = Path("data/processed/.pipeline_state.json")
+LOG_DIR = Path("data/processed/.pipeline_logs")
+
+
+class Stage:
+    def __init__(self, name, output, inputs=(), sources=(), deps=()):
+        self.name = name
+        self.script = SCRIPT_DIR / f"{name}.py"
+        self.output = Path(output)
+        self.inputs = list(inputs)  # glob patterns, relative to the repo root
+        self.sources = list(sources)  # remote datasets, part of the fingerprint by id only
+        self.deps = list(deps)
+
+
+STAGES = [
+    Stage(
+        "unlabel_bio_1",
+        "data/processed/unlabel_bio_1.jsonl",
+        inputs=["data/raw/bio/**/*.json"],
+        sources=["kaggle:maverickss26/bioasq-dataset"],
+    ),
+    Stage(
+        "unlabel_bio_2",
+        "data/processed/unlabel_bio_2.jsonl",
+        sources=["hf:Hmehdi515/biomedical_en-de"],
+    ),
+    Stage(
+        "unlabel_bio_3",
+        "data/processed/unlabel_bio_3.jsonl",
+        inputs=["data/raw/bio/medical_text_raw.jsonl"],
+        sources=["hf:123rc/medical_text"],
+        deps=["unlabel_bio_1"],
+    ),
+    Stage(
+        "unlabel_financial_1",
+        "data/processed/unlabel_financial_1.jsonl",
+        inputs=["data/raw/financial/*.jsonl"],
+        sources=["hf:lukecarlate/english_finance_news"],
+    ),
+    Stage(
+        "unlabel_financial_2",
+        "data/processed/unlabel_financial_2.jsonl",
+        sources=["hf:lukecarlate/english_finance_news", "hf:takala/financial_phrasebank@4a94a23"],
+    ),
+]
+
+
+# ---------- fingerprints ----------
+
+def local_modules(script: Path, seen=None):
+    """The script and every module in its directory it (transitively) imports."""
+    seen = set() if seen is None else seen
+    if script in seen:
+        return seen
+    seen.add(script)
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            candidate = script.parent / f"{name.split('.')[0]}.py"
+            if candidate.exists():
+                local_modules(candidate, seen)
+    return seen
+
+
+def code_hash(stage: Stage) -> str:
+    h = hashlib.sha256()
+    for path in sorted(local_modules(stage.script)):
+        h.update(str(path).encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def file_stat(path: Path):
+    st = path.stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def input_hash(stage: Stage) -> str:
+    h = hashlib.sha256()
+    for source in stage.sources:
+        h.update(f"source {source}\n".encode())
+    for pattern in stage.inputs:
+        for path in sorted(Path().glob(pattern)):
+            if path.is_file():
+                h.update(f"file {path} {file_stat(path)}\n".encode())
+    return h.hexdigest()
+
+
+def fingerprint(stage: Stage):
+    return {
+        "code": code_hash(stage),
+        "inputs": input_hash(stage),
+        "output": file_stat(stage.output) if stage.output.exists() else None,
+    }
+
+
+def is_current(stage: Stage, state) -> bool:
+    recorded = state.get(stage.name)
+    return recorded is not None and recorded == fingerprint(stage)
+
+
+def load_state():
+    if not STATE_PATH.exists():
+        return {}
+    with STATE_PATH.open() as f:
+        return json.load(f)
+
+
+def save_state(state):
+    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_PATH.with_suffix(".tmp")
+    with tmp.open("w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, STATE_PATH)
+
+
+# ---------- running ----------
+
+def run_script(script: str, log_path: str):
+    """Worker: run one ingestion script as __main__, stdout/stderr to its log."""
+    sys.path.insert(0, str(Path(script).parent))
+    t0 = time.time()
+    with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        runpy.run_path(script, run_name="__main__")
+    return time.time() - t0
+
+
+def tail(path: Path, n=15):
+    if not path.exists():
+        return ""
+    return "".join(path.read_text(encoding="utf-8", errors="replace").splitlines(keepends=True)[-n:])
+
+
+def run_pipeline(stages, workers, force=False, dry_run=False):
+    """Run stages in dependency order; returns the names of the stages that failed."""
+    by_name = {s.name: s for s in stages}
+    state = load_state()
+    pending = dict(by_name)
+    done, failed = set(), set()
+    running = {}
+
+    if not dry_run:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                deps = [d for d in stage.deps if d in by_name]
+                if any(d in failed for d in deps):
+                    print(f"⏭  {name}: skipped, dependency failed")
+                    failed.add(name)
+                    del pending[name]
+                elif all(d in done for d in deps):
+                    del pending[name]
+                    if not force and is_current(stage, state):
+                        print(f"✓  {name}: up to date")
+                        done.add(name)
+                    elif dry_run:
+                        print(f"•  {name}: would run")
+                        done.add(name)
+                    else:
+                        print(f"▶  {name}: running (log: {LOG_DIR / (name + '.log')})")
+                        stage.output.unlink(missing_ok=True)
+                        fut = pool.submit(run_script, str(stage.script), str(LOG_DIR / f"{name}.log"))
+                        running[fut] = stage
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage = running.pop(fut)
+                try:
+                    seconds = fut.result()
+                except BaseException as e:  # SystemExit from a script counts as a failure too
+                    print(f"❌ {stage.name}: failed ({type(e).__name__}: {e})")
+                    print(tail(LOG_DIR / f"{stage.name}.log"), end="")
+                    failed.add(stage.name)
+                    state.pop(stage.name, None)
+                else:
+                    print(f"✅ {stage.name}: done in {seconds:.1f}s")
+                    done.add(stage.name)
+                    state[stage.name] = fingerprint(stage)
+                save_state(state)
+    return failed
+
+
+# ---------- summary ----------
+
+def count_lines(path: Path) -> int:
+    n = 0
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            n += chunk.count(b"\n")
+    return n
+
+
+def human_size(n: int) -> str:
+    for unit in "BKMGT":
+        if n < 1024 or unit == "T":
+            return f"{n:.0f}{unit}" if unit == "B" or n >= 10 else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def print_summary(processed_dir=Path("data/processed")):
+    print("\n==========================================")
+    print("数据处理完成！统计信息：")
+    print("==========================================")
+    totals = {"bio": 0, "financial": 0}
+    for path in sorted(processed_dir.glob("unlabel_*.jsonl")):
+        count = count_lines(path)
+        print(f"  {path.name}: {count} 条数据 ({human_size(path.stat().st_size)})")
+        for domain in totals:
+            if path.name.startswith(f"unlabel_{domain}_"):
+                totals[domain] += count
+    print(f"\n生物医学总计：{totals['bio']}")
+    print(f"金融总计：{totals['financial']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Stage 1 ingestion scripts as an incremental DAG")
+    parser.add_argument("--stages", nargs="*", default=None, help="Only these stages (default: all)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--force", action="store_true", help="Rerun every selected stage")
+    parser.add_argument("--dry_run", action="store_true", help="Only show what would run")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    os.chdir(REPO_ROOT)
+    stages = STAGES
+    if args.stages:
+        unknown = set(args.stages) - {s.name for s in STAGES}
+        if unknown:
+            sys.exit(f"Unknown stages: {', '.join(sorted(unknown))}")
+        stages = [s for s in STAGES if s.name in args.stages]
+
+    failed = run_pipeline(stages, args.workers, args.force, args.dry_run)
+    if args.dry_run:
+        return
+    print_summary()
+    if failed:
+        print(f"\n❌ Failed: {', '.join(sorted(failed))}")
+        sys.exit(1)
+    print("\n✅ 所有数据处理完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 from pathlib import Path
-import json
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 
+from jsonl_io import read_jsonl_df, write_df_jsonl
+from parquet_io import emit_parquet
+
 IN_PATH = Path("data/processed/finance_combined.jsonl")
 OUT_TRAIN = Path("data/processed/label_financial_3_train.jsonl")
 OUT_VAL   = Path("data/processed/label_financial_3_val.jsonl")
@@ -11,19 +13,11 @@ OUT_TEST  = Path("data/processed/label_financial_3_test.jsonl")
 
 
 def load_jsonl(path: Path):
-    rows = []
-    with path.open("r", encoding="utf-8") as f:
-        for line in f:
-            rows.append(json.loads(line))
-    return pd.DataFrame(rows)   # expects columns: text, label (0/1/2)
+    return read_jsonl_df(path)   # expects columns: text, label (0/1/2)
 
 
 def write_jsonl(df: pd.DataFrame, path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        for _, row in df.iterrows():
-            rec = {"text": row["text"], "label": int(row["label"])}
-            f.write(json.dumps(rec) + "\n")
+    write_df_jsonl(df.assign(label=df["label"].astype(int)), path, ["text", "label"])
     print(f"Wrote {len(df)} rows → {path}")
 
 
@@ -51,6 +45,8 @@ def main():
     write_jsonl(train_df, OUT_TRAIN)
     write_jsonl(val_df, OUT_VAL)
     write_jsonl(test_df, OUT_TEST)
+    for path in (OUT_TRAIN, OUT_VAL, OUT_TEST):
+        emit_parquet(path, domain="FIN")
 
 
 if __name__ == "__main__":
@@ -5,11 +5,13 @@
 - Mixed平衡数据: 从Bio和Finance各取相同数量，保证50/50平衡
 """
 
-import json
 import random
 from pathlib import Path
 from collections import Counter
 
+from jsonl_io import read_jsonl, write_jsonl
+from parquet_io import emit_parquet
+
 random.seed(42)
 
 # 文件路径
@@ -25,18 +27,16 @@ finance_data = []
 for f in bio_files:
     path = data_dir / f
     if path.exists():
-        with open(path) as file:
-            data = [json.loads(line) for line in file]
-            bio_data.extend(data)
-            print(f"{f}: {len(data)} samples")
+        data = list(read_jsonl(path))
+        bio_data.extend(data)
+        print(f"{f}: {len(data)} samples")
 
 for f in finance_files:
     path = data_dir / f
     if path.exists():
-        with open(path) as file:
-            data = [json.loads(line) for line in file]
-            finance_data.extend(data)
-            print(f"{f}: {len(data)} samples")
+        data = list(read_jsonl(path))
+        finance_data.extend(data)
+        print(f"{f}: {len(data)} samples")
 
 print(f"\nBio总数: {len(bio_data)}")
 print(f"Finance总数: {len(finance_data)}")
@@ -80,10 +80,9 @@ print(f"Mixed balanced train: {len(mixed_train)}")
 print(f"Mixed balanced test: {len(mixed_test)}")
 
 # 保存文件
-def save_jsonl(data, filepath):
-    with open(filepath, 'w') as f:
-        for item in data:
-            f.write(json.dumps(item) + '\n')
+def save_jsonl(data, filepath, domain=None):
+    write_jsonl(data, filepath)
+    emit_parquet(filepath, domain=domain)
     
 def print_label_dist(data, name):
     labels = Counter([d['label'] for d in data])
@@ -92,14 +91,14 @@ def print_label_dist(data, name):
 print("\n=== 保存文件 ===")
 
 # Bio数据
-save_jsonl(bio_train, data_dir / "bio_train.jsonl")
-save_jsonl(bio_test, data_dir / "bio_test.jsonl")
+save_jsonl(bio_train, data_dir / "bio_train.jsonl", "BIO")
+save_jsonl(bio_test, data_dir / "bio_test.jsonl", "BIO")
 print_label_dist(bio_train, "Bio train")
 print_label_dist(bio_test, "Bio test")
 
 # Finance数据
-save_jsonl(finance_train, data_dir / "finance_train.jsonl")
-save_jsonl(finance_test, data_dir / "finance_test.jsonl")
+save_jsonl(finance_train, data_dir / "finance_train.jsonl", "FIN")
+save_jsonl(finance_test, data_dir / "finance_test.jsonl", "FIN")
 print_label_dist(finance_train, "Finance train")
 print_label_dist(finance_test, "Finance test")
 
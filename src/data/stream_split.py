@@ -0,0 +1,174 @@
+"""
+Streaming, reproducible train/val/test splitting and label-balanced subsampling.
+
+split_train_test.py, split.py and label_bio_3.stratified_subsample load every
+record before shuffling / stratifying. This does both in one pass over any
+number of JSONL files, in memory independent of the corpus size:
+
+  split      each record goes to the split its seeded hash falls into:
+             u = blake2b(seed, normalized text) / 2**64, compared with the
+             cumulative split fractions. The assignment depends only on the
+             text, so it is the same on every run, for any input order, and
+             texts that normalize the same (casing / punctuation / spaces, see
+             leakage.normalize) always land in the same split, so they cannot
+             leak from train into test.
+  subsample  with --max_total, a per-label bottom-k reservoir (keep the k
+             records with the smallest seeded hash priority) keeps
+             max_total // num_labels records per label, topped up from the
+             other labels' overflow when a label is short, as in
+             stratified_subsample. Memory is O(max_total) per label.
+
+Split sizes and label proportions follow from the hash rather than being
+forced like sklearn's stratify=, so they match the fractions up to sampling
+noise (finance_combined: 11493 / 1523 / 1361 for 0.8 / 0.1 / 0.1, label
+shares within 1 point of the whole file). The per-split label counts are
+printed so it can be checked.
+
+The existing split scripts are left as they are, so the splits the reported
+experiments used can still be regenerated bit for bit.
+
+Usage:
+    python src/data/stream_split.py data/processed/finance_combined.jsonl \
+        --out_dir data/processed --prefix finance_stream --splits train=0.8 val=0.1 test=0.1
+    python src/data/stream_split.py data/processed/label_bio_*.jsonl --max_total 8000 \
+        --out_dir data/processed --prefix bio_stream --splits train=0.8 test=0.2
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from jsonl_io import json_encoder, open_text, read_jsonl
+from leakage import normalize
+
+
+def seeded_hash(text, seed, salt: str) -> int:
+    key = f"{seed}\x1f{salt}\x1f{normalize(text)}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def parse_splits(specs):
+    """["train=0.8", "val=0.1", "test=0.1"] -> [("train", 0.8), ...], fractions summing to 1."""
+    splits = []
+    for spec in specs:
+        name, _, frac = spec.partition("=")
+        if not name or not frac:
+            raise ValueError(f"Expected NAME=FRACTION, got {spec!r}")
+        splits.append((name, float(frac)))
+    total = sum(f for _, f in splits)
+    if abs(total - 1.0) > 1e-6:
+        raise ValueError(f"Split fractions must sum to 1, got {total}")
+    return splits
+
+
+class HashSplitter:
+    def __init__(self, splits, seed=42):
+        self.names = [name for name, _ in splits]
+        bounds = list(itertools.accumulate(f for _, f in splits))
+        # upper bound of every split on the 64-bit hash range; the last one takes the rest
+        self.bounds = [int(b * (1 << 64)) for b in bounds[:-1]] + [1 << 64]
+        self.seed = seed
+
+    def assign(self, text) -> str:
+        h = seeded_hash(text, self.seed, "split")
+        for name, bound in zip(self.names, self.bounds):
+            if h < bound:
+                return name
+        return self.names[-1]
+
+
+class LabelReservoir:
+    """Bottom-k sample per label by seeded hash priority, plus a top-up pool."""
+
+    def __init__(self, max_total, seed=42, label_field="label"):
+        self.max_total = max_total
+        self.seed = seed
+        self.label_field = label_field
+        self.heaps = defaultdict(list)  # label -> max-heap of (-priority, n, record), size <= max_total
+        self.seen = Counter()
+        self.n = 0
+
+    def add(self, record):
+        label = record.get(self.label_field)
+        priority = seeded_hash(record.get("text", ""), self.seed, "sample")
+        item = (-priority, self.n, record)
+        self.n += 1
+        self.seen[label] += 1
+        heap = self.heaps[label]
+        # every label keeps up to max_total candidates: enough for its own quota and for topping up
+        if len(heap) < self.max_total:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    def sample(self):
+        """The balanced sample, in a deterministic pseudo-random order."""
+        labels = sorted(self.heaps, key=str)
+        per = self.max_total // max(len(labels), 1)
+        chosen, overflow = [], []
+        for label in labels:
+            ranked = sorted(self.heaps[label], reverse=True)  # smallest priority first
+            chosen.extend(ranked[:per])
+            overflow.extend(ranked[per:])
+            print(f"  label {label}: {min(per, len(ranked))} sampled (from {self.seen[label]})")
+        overflow.sort(reverse=True)
+        chosen.extend(overflow[: self.max_total - len(chosen)])
+        chosen.sort(reverse=True)
+        return [record for _, _, record in chosen]
+
+
+def stream_split(records, splitter, out_paths, label_field="label", ensure_ascii=True):
+    """Write every record to its split's file; returns {split: Counter of labels}."""
+    encode = json_encoder(ensure_ascii)
+    counts = {name: Counter() for name in splitter.names}
+    files = {name: open_text(path, "w") for name, path in out_paths.items()}
+    try:
+        for record in records:
+            name = splitter.assign(record.get("text", ""))
+            files[name].write(encode(record) + "\n")
+            counts[name][record.get(label_field)] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Single-pass hash split / balanced subsample of JSONL files")
+    parser.add_argument("inputs", nargs="+", help="JSONL files with 'text' (and label) fields")
+    parser.add_argument("--out_dir", type=str, default="data/processed")
+    parser.add_argument("--prefix", type=str, required=True, help="Writes {prefix}_{split}.jsonl")
+    parser.add_argument("--splits", nargs="+", default=["train=0.8", "val=0.1", "test=0.1"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max_total", type=int, default=0, help="Label-balanced subsample size (0: keep all)")
+    parser.add_argument("--label_field", type=str, default="label")
+    parser.add_argument("--ensure_ascii", choices=["on", "off"], default="on")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    splitter = HashSplitter(parse_splits(args.splits), args.seed)
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_paths = {name: out_dir / f"{args.prefix}_{name}.jsonl" for name in splitter.names}
+
+    records = itertools.chain.from_iterable(read_jsonl(p) for p in args.inputs)
+    if args.max_total:
+        reservoir = LabelReservoir(args.max_total, args.seed, args.label_field)
+        for record in records:
+            reservoir.add(record)
+        print(f"🔻 Subsampling {reservoir.n} → {min(args.max_total, reservoir.n)} rows (balanced by label)")
+        records = reservoir.sample()
+
+    counts = stream_split(records, splitter, out_paths, args.label_field, args.ensure_ascii == "on")
+    for name, path in out_paths.items():
+        dist = ", ".join(f"{label}={n}" for label, n in sorted(counts[name].items(), key=lambda kv: str(kv[0])))
+        print(f"Wrote {sum(counts[name].values())} rows → {path}  ({dist})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Text normalization shared by the ingestion scripts (and, for its cache keys,
+src/models/prediction_cache.py), so every consumer agrees on when two texts
+are the same row.
+"""
+
+import re
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Collapse runs of whitespace (newlines included) to one space and strip; non-strings become ""."""
+    if not isinstance(text, str):
+        return ""
+    return WHITESPACE_RE.sub(" ", text).strip()
@@ -1,14 +1,20 @@
 from pathlib import Path
 import json
-import re
+import shutil
 import kagglehub
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
+try:
+    import ijson
+except ImportError:  # optional streaming parser
+    ijson = None
+
 RAW_DIR = Path("data/raw/bio")
 OUT_PATH = Path("data/processed/unlabel_bio_1.jsonl")
-
-def normalize(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
+CONTEXT_PREFIX = "data.item.paragraphs.item.context"
 
 
 def download_bioasq_if_needed():
@@ -26,7 +32,7 @@ def download_bioasq_if_needed():
         for file in Path(path).rglob("*"):
             if file.is_file():
                 target = RAW_DIR / file.name
-                target.write_bytes(file.read_bytes())
+                shutil.copyfile(file, target)  # chunked, never the whole file in memory
         
         print("BioASQ files copied to:", RAW_DIR)
     else:
@@ -34,24 +40,50 @@ def download_bioasq_if_needed():
 
 
 
-def iter_texts_from_bioasq():
-    for p in RAW_DIR.glob("**/*.json"):
-        print("Reading:", p)
+def iter_contexts(p: Path):
+    """
+    Yield the paragraph contexts of one BioASQ file (data -> paragraphs -> context).
 
+    With ijson installed the file is parsed as an event stream and only one
+    context string is built at a time; otherwise it is json.load-ed whole.
+    """
+    if ijson is None:
         with open(p, "r", encoding="utf-8") as f:
             obj = json.load(f)
-
-        # Your BioASQ format: data -> paragraphs -> context
         if isinstance(obj, dict) and "data" in obj:
             for article in obj["data"]:
                 for para in article.get("paragraphs", []):
-                    txt = normalize(para.get("context", ""))
-                    if len(txt) > 30:
-                        yield txt
-
-        # Fallback in case structure changes
+                    yield para.get("context", "")
         else:
             print("Unknown structure in:", p)
+        return
+
+    found = False
+    with open(p, "rb") as f:
+        for context in ijson.items(f, CONTEXT_PREFIX):
+            found = True
+            yield context
+    if not found and not has_top_level_key(p, "data"):
+        print("Unknown structure in:", p)
+
+
+def has_top_level_key(p: Path, key: str) -> bool:
+    with open(p, "rb") as f:
+        for prefix, event, value in ijson.parse(f):
+            if prefix == "" and event == "map_key" and value == key:
+                return True
+    return False
+
+
+def iter_texts_from_bioasq():
+    for p in RAW_DIR.glob("**/*.json"):
+        print("Reading:", p)
+
+        # Your BioASQ format: data -> paragraphs -> context
+        for context in iter_contexts(p):
+            txt = normalize(context)
+            if len(txt) > 30:
+                yield txt
 
 
 
@@ -60,14 +92,15 @@ def main():
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     download_bioasq_if_needed()
+    if ijson is None:
+        print("⚠️  ijson not installed (pip install ijson): loading each BioASQ file whole with json.load")
 
-    seen = set()
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
         for txt in iter_texts_from_bioasq():
-            if txt not in seen:
-                seen.add(txt)
+            if seen.add(txt):
                 w.write(json.dumps({"text": txt}) + "\n")
 
+    emit_parquet(OUT_PATH, domain="BIO")
     print("Finished preprocessing BioASQ →", OUT_PATH)
 
 
@@ -1,13 +1,13 @@
 from datasets import load_dataset
 from pathlib import Path
 import json
-import re
+
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
 
 OUT_PATH = Path("data/processed/unlabel_bio_2.jsonl")
 
-def normalize(text: str) -> str:
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
 
 def extract_english(row):
     if "text" not in row:
@@ -40,10 +40,9 @@ def main():
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    seen = set()
     count = 0
 
-    with OUT_PATH.open("w", encoding="utf-8") as f:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as f:
         for split in dataset:
             for row in dataset[split]:
                 text = extract_english(row)
@@ -56,13 +55,13 @@ def main():
                 if len(text) < 50:
                     continue
 
-                if text in seen:
+                if not seen.add(text):
                     continue
 
-                seen.add(text)
                 f.write(json.dumps({"text": text}) + "\n")
                 count += 1
 
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"✅ Done! Saved {count} English samples to {OUT_PATH}")
 
 if __name__ == "__main__":
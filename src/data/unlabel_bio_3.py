@@ -1,16 +1,14 @@
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
 RAW_DIR = Path("data/raw/bio")
 OUT_PATH = Path("data/processed/unlabel_bio_3.jsonl")
 
-def normalize(text: str) -> str:
-    """Normalize whitespace and strip."""
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
 
 def download_medical_if_needed():
     """ 
@@ -60,13 +58,12 @@ def main():
 
     download_medical_if_needed()
 
-    seen = set()
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
         for txt in iter_texts_from_medical():
-            if txt not in seen:
-                seen.add(txt)
+            if seen.add(txt):
                 w.write(json.dumps({"text": txt}) + "\n")
 
+    emit_parquet(OUT_PATH, domain="BIO")
     print(f"✅ Done! Saved {len(seen)} medical text samples to {OUT_PATH}")
 
 
@@ -1,16 +1,14 @@
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
 RAW_DIR = Path("data/raw/financial")
 OUT_PATH = Path("data/processed/unlabel_financial_1.jsonl")
 
-def normalize(text: str) -> str:
-    """Normalize whitespace and strip."""
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
 
 def download_finance_if_needed():
     """ 
@@ -58,13 +56,12 @@ def main():
 
     download_finance_if_needed()
 
-    seen = set()
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
         for txt in iter_texts_from_finance():
-            if txt not in seen:
-                seen.add(txt)
+            if seen.add(txt):
                 w.write(json.dumps({"text": txt}) + "\n")
 
+    emit_parquet(OUT_PATH, domain="FIN")
     print("Finished preprocessing finance dataset →", OUT_PATH)
 
 
@@ -1,16 +1,14 @@
 from pathlib import Path
 import json
-import re
 from datasets import load_dataset
 
+from dedupe_store import DedupeStore
+from parquet_io import emit_parquet
+from text_norm import normalize
+
 RAW_DIR = Path("data/raw/financial")
 OUT_PATH = Path("data/processed/unlabel_financial_2.jsonl")
 
-def normalize(text: str) -> str:
-    """Normalize whitespace and strip."""
-    text = re.sub(r"\s+", " ", text)
-    return text.strip()
-
 
 def iter_finance_news():
     print("Loading lukecarlate/english_finance_news ...")
@@ -48,22 +46,19 @@ def main():
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    seen = set()
-
-    with OUT_PATH.open("w", encoding="utf-8") as w:
+    with DedupeStore.for_output(OUT_PATH) as seen, OUT_PATH.open(seen.output_mode, encoding="utf-8") as w:
 
         # Finance News
         for txt in iter_finance_news():
-            if txt not in seen:
-                seen.add(txt)
+            if seen.add(txt):
                 w.write(json.dumps({"text": txt}) + "\n")
 
         # Phrasebank
         for txt in iter_phrasebank():
-            if txt not in seen:
-                seen.add(txt)
+            if seen.add(txt):
                 w.write(json.dumps({"text": txt}) + "\n")
 
+    emit_parquet(OUT_PATH, domain="FIN")
     print("Finished preprocessing financial datasets →", OUT_PATH)
 
 
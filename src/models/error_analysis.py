@@ -0,0 +1,246 @@
+"""
+Streaming error-analysis export in the error_analysis_file/*.json schema.
+
+Misclassifications are taken straight from the prediction stream, either a
+predict.py output JSONL (records that carry both "label" and "pred_label") or
+a --model_dir scored on --input, and processed in chunks, so the full error
+set of a large test file is never held in memory.
+
+The annotation fields the notebooks left empty are pre-filled by precompiled
+regex rules, applied to each chunk with pandas' vectorized string methods:
+    length_category      short (<= 12 words) / medium (<= 40) / long
+    has_negation         yes / no
+    sarcastic_or_ironic  yes / no  (cue phrases, scare quotes, "!?" runs, positive words in a negative example)
+    contains_numbers     yes / no
+    comment              which cues fired, e.g. "auto: contrast(but); negation(not); url"
+These are heuristics to speed up manual review, not gold annotations.
+
+--sample_per_domain N keeps N errors per domain, like the notebooks' stratified
+100-per-domain sample, using a seeded reservoir. It holds at most N errors per
+domain; the notebooks used np.random.choice, so the sample itself differs.
+Without it every error is written.
+
+Usage:
+    python src/models/error_analysis.py --predictions preds.jsonl --output errors_sft4.jsonl \
+        --sample_per_domain 100 --json_array error_analysis_file/error_analysis_sft4.json
+    python src/models/error_analysis.py --model_dir outputs/sft_4_mixed_mlm_no_adapter \
+        --input data/processed/mixed_balanced_test.jsonl --output errors_sft4.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import random
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from predict import iter_jsonl, iter_predictions, load_label_map, load_predictor, to_label_id
+
+
+FIELDS = [
+    "dataset_index",
+    "text",
+    "true_label",
+    "pred_label",
+    "domain",
+    "length_category",
+    "has_negation",
+    "sarcastic_or_ironic",
+    "contains_numbers",
+    "comment",
+]
+
+SHORT_MAX_WORDS = 12
+MEDIUM_MAX_WORDS = 40
+
+NEGATION_RE = re.compile(
+    r"\b(not|no|never|none|nothing|nobody|neither|nor|without|cannot|hardly|barely|\w+n't)\b", re.IGNORECASE
+)
+CONTRAST_RE = re.compile(r"\b(but|however|although|though|yet|nevertheless)\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d")
+SARCASM_CUE_RE = re.compile(
+    r"\b(?:yeah right|sure thing|oh great|oh wow|just great|just what i needed|thanks a lot|"
+    r"what a (?:joke|surprise)|big surprise|love how|gotta love|totally|lol|lmao|smh)\b|/s\b|🙄|😂",
+    re.IGNORECASE,
+)
+SCARE_QUOTE_RE = re.compile(r"[\"“][A-Za-z][\w' -]{0,25}[\"”]")
+EXCLAIM_RE = re.compile(r"[!?]{2,}")
+POSITIVE_RE = re.compile(r"\b(?:great|amazing|wonderful|love|fantastic|brilliant|perfect|best|awesome)\b", re.IGNORECASE)
+URL_RE = re.compile(r"https?://\S+")
+CASHTAG_RE = re.compile(r"\$[A-Za-z]{1,6}\b")
+
+def yes_no(mask):
+    return np.where(mask, "yes", "no")
+
+
+def annotate(chunk, negative_label):
+    """Fill the heuristic fields for a list of error dicts (one vectorized pass per rule)."""
+    df = pd.DataFrame(chunk, columns=FIELDS[:5])
+    text = df["text"].fillna("").astype(str)
+
+    n_words = text.str.split().str.len()
+    length = np.select([n_words <= SHORT_MAX_WORDS, n_words <= MEDIUM_MAX_WORDS], ["short", "medium"], "long")
+
+    negation = text.str.extract(NEGATION_RE, expand=False)
+    contrast = text.str.extract(CONTRAST_RE, expand=False)
+    sarcasm_cue = text.str.contains(SARCASM_CUE_RE)
+    scare_quotes = text.str.contains(SCARE_QUOTE_RE)
+    exclaim = text.str.contains(EXCLAIM_RE)
+    # positive wording on a gold-negative example
+    positive_on_negative = text.str.contains(POSITIVE_RE) & (df["true_label"] == negative_label)
+    numbers = text.str.contains(NUMBER_RE)
+    url = text.str.contains(URL_RE)
+    cashtag = text.str.contains(CASHTAG_RE)
+
+    cues = [
+        ("; contrast(" + contrast.str.lower() + ")", contrast.notna()),
+        ("; negation(" + negation.str.lower() + ")", negation.notna()),
+        ("; sarcasm cue", sarcasm_cue),
+        ("; scare quotes", scare_quotes),
+        ("; !?-run", exclaim),
+        ("; positive words, negative label", positive_on_negative),
+        ("; url", url),
+        ("; cashtag", cashtag),
+    ]
+    comment = pd.Series("", index=df.index)
+    for label, mask in cues:
+        comment = comment.where(~mask, comment + label)
+    comment = comment.str[2:]
+
+    df["length_category"] = length
+    df["has_negation"] = yes_no(negation.notna())
+    df["sarcastic_or_ironic"] = yes_no(sarcasm_cue | scare_quotes | exclaim | positive_on_negative)
+    df["contains_numbers"] = yes_no(numbers)
+    df["comment"] = np.where(comment != "", "auto: " + comment, "")
+    return df[FIELDS].to_dict("records")
+
+
+def iter_errors(pairs, label2id):
+    """pairs: iterable of (record, pred_label) in dataset order -> error dicts (schema fields 1-5)."""
+    for i, (record, pred) in enumerate(pairs):
+        true = to_label_id(record["label"], label2id)
+        if true != pred:
+            yield {
+                "dataset_index": i,
+                "text": record["text"],
+                "true_label": true,
+                "pred_label": int(pred),
+                "domain": record.get("domain") or "UNK",
+            }
+
+
+def iter_annotated(errors, negative_label, chunk_size=4096):
+    errors = iter(errors)
+    while True:
+        chunk = list(itertools.islice(errors, chunk_size))
+        if not chunk:
+            return
+        yield from annotate(chunk, negative_label)
+
+
+def sample_per_domain(errors, k, seed=42):
+    """Seeded reservoir sample of k errors per domain; memory is O(k * domains)."""
+    rng = random.Random(seed)
+    reservoirs, seen = {}, {}
+    for e in errors:
+        d = e["domain"]
+        seen[d] = seen.get(d, 0) + 1
+        res = reservoirs.setdefault(d, [])
+        if len(res) < k:
+            res.append(e)
+        else:
+            j = rng.randrange(seen[d])
+            if j < k:
+                res[j] = e
+    for d, res in reservoirs.items():
+        print(f"Sampled {len(res)} of {seen[d]} misclassified examples for domain {d}", file=sys.stderr)
+        yield from sorted(res, key=lambda e: e["dataset_index"])
+
+
+class JsonArrayWriter:
+    """Write a JSON array item by item (same layout as the notebooks' json.dump(indent=2))."""
+
+    def __init__(self, path):
+        self.f = open(path, "w", encoding="utf-8")
+        self.first = True
+        self.f.write("[")
+
+    def write(self, item):
+        body = json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        self.f.write(("\n  " if self.first else ",\n  ") + body)
+        self.first = False
+
+    def close(self):
+        self.f.write("]\n" if self.first else "\n]\n")
+        self.f.close()
+
+
+def prediction_pairs(args):
+    """(pairs, label map the predicted ids are in)."""
+    if args.predictions:
+        label2id = load_label_map(args.label_map) if args.label_map else load_label_map()
+        return ((r, int(r["pred_label"])) for r in iter_jsonl(args.predictions)), label2id
+    predictor = load_predictor(args.model_dir, args.device, args.max_length, args.domain_prefix)
+    pairs = (
+        (r, int(np.argmax(p)))
+        for r, p in iter_predictions(iter_jsonl(args.input), predictor, args.batch_size, args.sort_window)
+    )
+    return pairs, predictor.label2id
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Stream misclassified examples with auto-filled analysis fields")
+    parser.add_argument("--predictions", type=str, default=None, help="predict.py output JSONL (with 'label')")
+    parser.add_argument("--model_dir", type=str, default=None, help="Score --input with this model instead")
+    parser.add_argument("--input", type=str, default=None, help="Labeled JSONL test file for --model_dir")
+    parser.add_argument(
+        "--label_map", type=str, default=None,
+        help="Label name -> id JSON the --predictions ids use (default: data/processed/label_map.json)",
+    )
+    parser.add_argument("--output", type=str, default="-", help="Errors as JSONL ('-' for stdout)")
+    parser.add_argument("--json_array", type=str, default=None, help="Also write a JSON array like error_analysis_file/")
+    parser.add_argument("--sample_per_domain", type=int, default=0, help="Errors kept per domain (0: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk_size", type=int, default=4096)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=256)
+    parser.add_argument("--sort_window", type=int, default=2048)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--domain_prefix", choices=["auto", "on", "off"], default="auto")
+    args = parser.parse_args()
+    if bool(args.predictions) == bool(args.model_dir):
+        parser.error("give exactly one of --predictions or --model_dir")
+    if args.model_dir and not args.input:
+        parser.error("--model_dir needs --input")
+    return args
+
+
+def main():
+    args = parse_args()
+    pairs, label2id = prediction_pairs(args)
+    errors = iter_errors(pairs, label2id)
+    if args.sample_per_domain:
+        errors = sample_per_domain(errors, args.sample_per_domain, args.seed)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    array = JsonArrayWriter(args.json_array) if args.json_array else None
+    n = 0
+    try:
+        for item in iter_annotated(errors, label2id["negative"], args.chunk_size):
+            out.write(json.dumps(item, ensure_ascii=False) + "\n")
+            if array is not None:
+                array.write(item)
+            n += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if array is not None:
+            array.close()
+    print(f"Wrote {n} misclassified examples", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+One-pass evaluation of every SFT checkpoint on every test set.
+
+Each test set is read and tokenized once per distinct tokenizer (SFT2–SFT7
+all share the bert + [FIN]/[BIO] vocab, so in practice once per test set);
+every checkpoint then scores the cached input ids in length-sorted batches.
+Checkpoints are loaded one at a time, and each is freed before the next loads.
+
+Writes one summary JSON:
+    {model: {test_set: {accuracy, macro_f1, weighted_f1,
+                        domains: {FIN: {...}, BIO: {...}},
+                        examples_per_sec, tokens_per_sec, ...}}}
+and, with predictions_file, an .npz of labels / domains / predicted ids per
+test set and model, for paired significance tests.
+
+Gold labels are resolved through label_map (data/processed/label_map.json,
+like the SFT configs); a checkpoint trained with a different label map is
+skipped rather than scored against mismatched ids.
+
+Any predict.py --model_dir works as a checkpoint: full fine-tune, unmerged
+LoRA adapter, int8 or ONNX export. Loading a LoRA adapter fails when it does
+not restore the modules its base lacks (e.g. the pooler of an MLM checkpoint;
+see predict.check_adapter_restores), since those would be scored with random
+weights. Checkpoints that fail to load are reported as skipped and left out
+of the predictions file, so significance.py / error_analysis.py never see them.
+
+Usage:
+    python src/models/evaluate.py --config src/configs/eval_sft_matrix.yaml
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import yaml
+from sklearn.metrics import accuracy_score, f1_score
+
+from mlm_cache import tokenizer_fingerprint
+from predict import iter_jsonl, load_label_map, load_predictor, to_label_id
+
+
+DOMAINS = ["FIN", "BIO"]
+
+
+def load_config(path: str):
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+class TestSet:
+    def __init__(self, name, path, label2id):
+        self.name = name
+        self.path = path
+        self.records = list(iter_jsonl(path))
+        self.labels = np.array([to_label_id(r["label"], label2id) for r in self.records], dtype=np.int64)
+        self.domains = np.array([r.get("domain") or "UNK" for r in self.records])
+        self._encoded = {}
+
+    def input_ids(self, predictor):
+        """Token ids for this predictor's tokenizer / prefix setting, tokenized on first use only."""
+        key = (tokenizer_fingerprint(predictor.tokenizer), predictor.use_domain_prefix, predictor.max_length)
+        if key not in self._encoded:
+            self._encoded[key] = predictor.encode([predictor.prepare(r) for r in self.records])
+        return self._encoded[key]
+
+
+def classification_metrics(labels, preds):
+    return {
+        "n": int(len(labels)),
+        "accuracy": float(accuracy_score(labels, preds)),
+        "macro_f1": float(f1_score(labels, preds, average="macro")),
+        "weighted_f1": float(f1_score(labels, preds, average="weighted")),
+    }
+
+
+def evaluate_checkpoint(predictor, test_set, batch_size):
+    input_ids = test_set.input_ids(predictor)
+    # warm-up batch so one-time kernel/allocator setup isn't timed
+    predictor.score(input_ids[:batch_size], batch_size=batch_size)
+
+    start = time.perf_counter()
+    preds = predictor.score(input_ids, batch_size=batch_size).argmax(axis=-1)
+    seconds = time.perf_counter() - start
+
+    result = classification_metrics(test_set.labels, preds)
+    result["domains"] = {
+        d: classification_metrics(test_set.labels[mask], preds[mask])
+        for d in DOMAINS
+        if (mask := test_set.domains == d).any()
+    }
+    result["seconds"] = seconds
+    result["examples_per_sec"] = len(input_ids) / seconds
+    result["tokens_per_sec"] = sum(len(ids) for ids in input_ids) / seconds
+    return result, preds
+
+
+def free_memory():
+    """Return memory of models no longer referenced (callers drop their references first)."""
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate all SFT checkpoints on all test sets")
+    parser.add_argument("--config", type=str, required=True)
+    parser.add_argument("--device", type=str, default=None)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    batch_size = int(config.get("batch_size", 64))
+    max_length = int(config.get("max_length", 256))
+    domain_prefix = config.get("domain_prefix", "auto")
+    label2id = load_label_map(config["label_map"]) if config.get("label_map") else load_label_map()
+
+    start = time.perf_counter()
+    test_sets = [TestSet(name, path, label2id) for name, path in config["test_sets"].items()]
+    for ts in test_sets:
+        print(f"Loaded test set {ts.name}: {len(ts.records)} examples ({ts.path})")
+
+    summary = {}
+    predictions = {f"{ts.name}/labels": ts.labels for ts in test_sets}
+    predictions.update({f"{ts.name}/domains": ts.domains for ts in test_sets})
+
+    for model_name, model_dir in config["checkpoints"].items():
+        if not Path(model_dir).exists():
+            print(f"⚠️  Skipping {model_name}: {model_dir} not found", file=sys.stderr)
+            continue
+
+        load_start = time.perf_counter()
+        skipped = None
+        try:
+            predictor = load_predictor(model_dir, args.device, max_length, domain_prefix)
+            if predictor.label2id != label2id:
+                raise ValueError(f"trained with label map {predictor.label2id}, test labels use {label2id}")
+        except ValueError as e:
+            skipped = str(e)  # not e itself: its traceback would keep the half-loaded model alive
+        if skipped is not None:
+            print(f"⚠️  Skipping {model_name}: {skipped}", file=sys.stderr)
+            summary[model_name] = {"model_dir": model_dir, "skipped": skipped}
+            predictor = None
+            free_memory()
+            continue
+        summary[model_name] = {"model_dir": model_dir, "load_seconds": time.perf_counter() - load_start}
+
+        for ts in test_sets:
+            result, preds = evaluate_checkpoint(predictor, ts, batch_size)
+            summary[model_name][ts.name] = result
+            predictions[f"{ts.name}/{model_name}"] = preds.astype(np.int8)
+            print(
+                f"{model_name:>8} | {ts.name:<8} acc={result['accuracy']:.4f} "
+                f"macroF1={result['macro_f1']:.4f} weightedF1={result['weighted_f1']:.4f} "
+                f"({result['examples_per_sec']:.0f} ex/s)"
+            )
+        predictor = None
+        free_memory()
+
+    output_file = Path(config.get("output_file", "outputs/eval_summary.json"))
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with output_file.open("w") as f:
+        json.dump(
+            {"config": args.config, "total_seconds": time.perf_counter() - start, "results": summary},
+            f,
+            indent=2,
+        )
+    print(f"Saved summary → {output_file}")
+
+    if config.get("predictions_file"):
+        np.savez_compressed(config["predictions_file"], **predictions)
+        print(f"Saved predictions → {config['predictions_file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Export an SFT checkpoint to ONNX for ONNX Runtime serving.
+
+The graph takes input_ids / attention_mask with dynamic batch and sequence
+axes and returns logits. The tokenizer and label map are saved next to it
+unchanged, so the [FIN]/[BIO] special tokens (and the resized embedding rows)
+and the label names carry over.
+After export, PyTorch and ONNX Runtime logits are compared on a sample of
+inputs; the export fails (exit code 1) if they differ by more than --atol.
+
+The output directory is a drop-in --model_dir for predict.py.
+
+Usage:
+    python src/models/export_onnx.py --model_dir outputs/sft_4_mixed_mlm_no_adapter \
+        --out_dir outputs/sft_4_onnx --sample_file data/processed/mixed_balanced_test.jsonl
+"""
+
+import argparse
+import inspect
+import itertools
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer
+
+from predict import (
+    DOMAIN_TOKENS,
+    ONNX_MODEL,
+    OnnxPredictor,
+    Predictor,
+    checkpoint_label_map,
+    has_domain_tokens,
+    iter_jsonl,
+    load_model,
+    save_label_map,
+)
+
+
+SAMPLE_TEXTS = [
+    "Shares fell 5% after the company cut its full-year guidance.",
+    "The medication worked well and I had no side effects.",
+    "ok",
+]
+
+
+class LogitsOnly(torch.nn.Module):
+    """Expose a plain (input_ids, attention_mask) -> logits signature to the exporter."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export(model, tokenizer, label2id, out_dir, opset):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    dummy = tokenizer(["hello world", "a longer dummy input"], padding=True, return_tensors="pt")
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # TorchScript exporter: honours dynamic_axes
+
+    torch.onnx.export(
+        LogitsOnly(model.eval()),
+        (dummy["input_ids"], dummy["attention_mask"]),
+        str(out_dir / ONNX_MODEL),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch"},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+        **kwargs,
+    )
+    model.config.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    save_label_map(label2id, out_dir)
+    print(f"Saved ONNX model → {out_dir / ONNX_MODEL}")
+
+
+def sample_records(sample_file, n):
+    if sample_file:
+        return list(itertools.islice(iter_jsonl(sample_file), n))
+    records = [{"text": t} for t in SAMPLE_TEXTS]
+    # exercise the domain tokens when the tokenizer has them
+    records += [{"text": t, "domain": d} for t, d in zip(SAMPLE_TEXTS, DOMAIN_TOKENS)]
+    return records
+
+
+def check_parity(model, tokenizer, out_dir, records, max_length, batch_size):
+    torch_pred = Predictor(model, tokenizer, "cpu", max_length)
+    onnx_pred = OnnxPredictor(out_dir, AutoTokenizer.from_pretrained(out_dir), max_length)
+
+    input_ids = torch_pred.encode([torch_pred.prepare(r) for r in records])
+    if onnx_pred.encode([onnx_pred.prepare(r) for r in records]) != input_ids:
+        raise ValueError("Saved tokenizer encodes differently from the source tokenizer.")
+
+    max_diff = 0.0
+    for i in range(0, len(input_ids), batch_size):
+        batch = input_ids[i : i + batch_size]
+        diff = np.abs(torch_pred.logits(batch) - onnx_pred.logits(batch)).max()
+        max_diff = max(max_diff, float(diff))
+    return max_diff
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ONNX export of an SFT checkpoint")
+    parser.add_argument("--model_dir", type=str, required=True)
+    parser.add_argument("--out_dir", type=str, required=True)
+    parser.add_argument("--sample_file", type=str, default=None, help="JSONL used for the logits check")
+    parser.add_argument("--num_samples", type=int, default=256)
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=256)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir, use_fast=True)
+    model = load_model(args.model_dir, tokenizer).eval()
+
+    export(model, tokenizer, checkpoint_label_map(args.model_dir, model.config), args.out_dir, args.opset)
+    if has_domain_tokens(tokenizer):
+        print("Domain tokens kept:", ", ".join(DOMAIN_TOKENS.values()))
+
+    records = sample_records(args.sample_file, args.num_samples)
+    max_diff = check_parity(model, tokenizer, args.out_dir, records, args.max_length, args.batch_size)
+    with (Path(args.out_dir) / "onnx_export.json").open("w") as f:
+        json.dump(
+            {"source": args.model_dir, "opset": args.opset, "checked": len(records), "max_abs_diff": max_diff},
+            f,
+            indent=2,
+        )
+
+    print(f"Max |logits(torch) - logits(onnxruntime)| over {len(records)} inputs: {max_diff:.2e}")
+    if max_diff > args.atol:
+        print(f"❌ Exceeds tolerance {args.atol}.")
+        sys.exit(1)
+    print("✅ ONNX export matches PyTorch.")
+
+
+if __name__ == "__main__":
+    main()
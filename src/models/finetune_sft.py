@@ -3,7 +3,7 @@ import json
 from pathlib import Path
 
 import yaml
-from datasets import load_dataset, concatenate_datasets
+from datasets import Value, load_dataset, concatenate_datasets
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
@@ -13,17 +13,59 @@ from transformers import (
 )
 from peft import LoraConfig, get_peft_model
 
+from sft_batching import TokenBudgetTrainer, report_padding
+from telemetry import TELEMETRY_FILE, Telemetry, TelemetryCallback
+from utils import default_num_proc
+
 
 def load_config(path: str):
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
 
-def load_jsonl_datasets(files):
-    """Load one or more JSONL files into a single HF Dataset."""
+def to_label_id(label, label_to_id):
+    """
+    Labels come as names ("negative"), digit strings ("0") or ints depending on
+    the file; names are looked up in the label map and ids must be ids it defines.
+    """
+    if isinstance(label, str) and not label.strip().isdigit():
+        return label_to_id[label.strip()]
+    label = int(label)
+    if label not in label_to_id.values():
+        raise ValueError(f"Label id {label} is not in the label map {label_to_id}")
+    return label
+
+
+def newly_initialized_modules(loading_info):
+    """Modules with weights the checkpoint did not provide (e.g. BERT's pooler on an MLM checkpoint)."""
+    keys = loading_info["missing_keys"] + [k for k, *_ in loading_info["mismatched_keys"]]
+    return sorted({k.rsplit(".", 1)[0] for k in keys})
+
+
+def load_labeled_datasets(files, label_to_id):
+    """
+    Load one or more JSONL / Parquet files into a single HF Dataset of (text, label id).
+
+    Labels are turned into ids per file, before concatenating, since the JSONL
+    files disagree on the label type; Parquet files written by
+    src/data/parquet_io.py already hold int8 ids.
+    """
     if isinstance(files, str):
         files = [files]
-    datasets = [load_dataset("json", data_files=f, split="train") for f in files]
+    datasets = []
+    for f in files:
+        builder = "parquet" if str(f).endswith(".parquet") else "json"
+        ds = load_dataset(builder, data_files=f, split="train").select_columns(["text", "label"])
+        if not ds.features["label"].dtype.startswith("int"):
+            ds = ds.map(
+                lambda batch: {"label": [to_label_id(label, label_to_id) for label in batch["label"]]},
+                batched=True,
+            )
+        else:  # int ids (e.g. Parquet from parquet_io.py) must still be ids of this label map
+            unknown = set(ds.unique("label")) - set(label_to_id.values())
+            if unknown:
+                raise ValueError(f"{f}: label ids {sorted(unknown)} are not in the label map {label_to_id}")
+        datasets.append(ds.cast_column("label", Value("int64")))
     if len(datasets) == 1:
         return datasets[0]
     return concatenate_datasets(datasets)
@@ -40,14 +82,27 @@ def main():
     output_dir = config["output_dir"]
     num_labels = int(config["num_labels"])
     label_map_path = config["label_map"]
+    num_proc = int(config.get("num_proc") or default_num_proc())
+
+    # -------- telemetry (phase timings, throughput, peak memory) ----------
+    telemetry = Telemetry(Path(output_dir) / TELEMETRY_FILE)
+    telemetry.start(
+        "finetune_sft",
+        args.config,
+        use_lora=bool(config.get("use_lora", False)),
+        max_tokens_per_batch=config.get("max_tokens_per_batch"),
+        num_proc=num_proc,
+    )
 
     # -------- tokenizer + base model ----------
-    tokenizer = AutoTokenizer.from_pretrained(model_path)
-    base_model = AutoModelForSequenceClassification.from_pretrained(
-        model_path,
-        num_labels=num_labels,
-        ignore_mismatched_sizes=True,  # 忽略分类头尺寸不匹配，会重新初始化
-    )
+    with telemetry.phase("load_model"):
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        base_model, loading_info = AutoModelForSequenceClassification.from_pretrained(
+            model_path,
+            num_labels=num_labels,
+            ignore_mismatched_sizes=True,  # 忽略分类头尺寸不匹配，会重新初始化
+            output_loading_info=True,
+        )
 
     # -------- optional LoRA adapters ----------
     use_lora = bool(config.get("use_lora", False))
@@ -57,6 +112,9 @@ def main():
             r=int(config.get("lora_r", 8)),
             lora_alpha=int(config.get("lora_alpha", 16)),
             lora_dropout=float(config.get("lora_dropout", 0.1)),
+            # Randomly initialized modules (classifier, and the pooler an MLM checkpoint
+            # lacks) are trained and saved in full; otherwise every load re-randomizes them.
+            modules_to_save=newly_initialized_modules(loading_info),
         )
         model = get_peft_model(base_model, lora_cfg)
     else:
@@ -66,22 +124,35 @@ def main():
     train_files = config["train_files"]
     eval_files = config["eval_files"]
 
-    train_ds = load_jsonl_datasets(train_files)
-    eval_ds = load_jsonl_datasets(eval_files)
-
     with open(label_map_path, "r") as f:
         label_map = json.load(f)  # e.g. {"negative": 0, "neutral": 1, "positive": 2}
     label_to_id = {k: int(v) for k, v in label_map.items()}
 
-    def encode(ex):
-        text = ex["text"]
-        label = label_to_id[ex["label"]]
-        tok = tokenizer(text, truncation=True, max_length=512)
-        tok["label"] = label  # 注意：应该是"label"不是"labels"
+    with telemetry.phase("load_data", split="train"):
+        train_ds = load_labeled_datasets(train_files, label_to_id)
+    with telemetry.phase("load_data", split="eval"):
+        eval_ds = load_labeled_datasets(eval_files, label_to_id)
+
+    # 批量编码 (fast tokenizer)，结果与逐条编码完全一致
+    def encode(batch):
+        tok = tokenizer(batch["text"], truncation=True, max_length=512)
+        tok["label"] = batch["label"]  # 注意：应该是"label"不是"labels"
         return tok
 
-    train_ds = train_ds.map(encode, batched=False, remove_columns=train_ds.column_names)
-    eval_ds = eval_ds.map(encode, batched=False, remove_columns=eval_ds.column_names)
+    with telemetry.phase("tokenize", split="train", rows=len(train_ds)):
+        train_ds = train_ds.map(
+            encode,
+            batched=True,
+            num_proc=min(num_proc, len(train_ds)),
+            remove_columns=train_ds.column_names,
+        )
+    with telemetry.phase("tokenize", split="eval", rows=len(eval_ds)):
+        eval_ds = eval_ds.map(
+            encode,
+            batched=True,
+            num_proc=min(num_proc, len(eval_ds)),
+            remove_columns=eval_ds.column_names,
+        )
     
     # 重命名label为labels (Trainer期望的字段名)
     train_ds = train_ds.rename_column("label", "labels")
@@ -109,7 +180,7 @@ def main():
         report_to=[],  # no wandb/tensorboard by default
     )
 
-    trainer = Trainer(
+    trainer_kwargs = dict(
         model=model,
         args=training_args,
         train_dataset=train_ds,
@@ -119,9 +190,30 @@ def main():
         compute_metrics=compute_metrics,
     )
 
+    # -------- optional token-budget batching (length-bucketed) ----------
+    max_tokens = config.get("max_tokens_per_batch")
+    if max_tokens:
+        max_tokens = int(max_tokens)
+        eval_max_tokens = int(config.get("eval_max_tokens_per_batch", max_tokens))
+        report_padding(train_ds, int(config.get("batch_size", 8)), max_tokens, "train")
+        report_padding(eval_ds, int(config.get("batch_size", 8)), eval_max_tokens, "eval")
+        trainer = TokenBudgetTrainer(
+            max_tokens,
+            eval_max_tokens=eval_max_tokens,
+            bucket_size=int(config.get("length_bucket_size", 1000)),
+            **trainer_kwargs,
+        )
+    else:
+        trainer = Trainer(**trainer_kwargs)
+    TelemetryCallback(telemetry).attach(trainer)
+
     trainer.train()
-    trainer.save_model(output_dir)
-    tokenizer.save_pretrained(output_dir)
+    with telemetry.phase("save"):
+        trainer.save_model(output_dir)
+        tokenizer.save_pretrained(output_dir)
+        # predict.py / evaluate.py resolve gold labels and label names through this copy
+        with (Path(output_dir) / "label_map.json").open("w") as f:
+            json.dump(label_to_id, f, indent=2)
 
 
 if __name__ == "__main__":
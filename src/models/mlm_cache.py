@@ -0,0 +1,168 @@
+"""
+On-disk cache for tokenized + packed MLM datasets.
+
+One entry per input file, keyed by:
+  - sha256 of the file content
+  - tokenizer identity (serialized fast tokenizer / vocab)
+  - packing parameters (max_seq_length, keep_remainder, ...)
+
+Entries are saved with Dataset.save_to_disk and evicted least-recently-used
+first once the cache grows past max_bytes. Writes go to a temp directory and
+are renamed into place, so a preempted job never leaves a half-written entry.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from datasets import load_from_disk
+
+
+HASH_CHUNK_BYTES = 1 << 20
+META_FILE = "meta.json"
+FILE_HASHES = "file_hashes.json"
+
+
+def hash_file(path):
+    """sha256 of a file's content, read in 1MB chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash everything about the tokenizer that changes its output ids."""
+    h = hashlib.sha256()
+    h.update(type(tokenizer).__name__.encode())
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        # Fast tokenizer: vocab, normalizer, pre-tokenizer and post-processor.
+        # truncation/padding are per-call state the tokenizer mutates, skip them.
+        state = json.loads(backend.to_str())
+        state.pop("truncation", None)
+        state.pop("padding", None)
+        h.update(json.dumps(state, sort_keys=True).encode())
+    else:
+        vocab = sorted(tokenizer.get_vocab().items())
+        h.update(json.dumps(vocab).encode())
+    h.update(json.dumps(tokenizer.all_special_tokens).encode())
+    return h.hexdigest()
+
+
+def dir_size(path):
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+class MLMDatasetCache:
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # keys used by this process are never evicted while it runs
+        self._pinned = set()
+        self._file_hashes_path = self.cache_dir / FILE_HASHES
+        self._file_hashes = self._read_file_hashes()
+
+    def _read_file_hashes(self):
+        if not self._file_hashes_path.exists():
+            return {}
+        try:
+            with self._file_hashes_path.open("r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_file_hashes(self):
+        tmp = self._file_hashes_path.with_suffix(f".tmp{os.getpid()}")
+        with tmp.open("w") as f:
+            json.dump(self._file_hashes, f, indent=2)
+        os.replace(tmp, self._file_hashes_path)
+
+    def content_hash(self, path):
+        """
+        Content hash of an input file. Re-hashing a multi-GB file on every
+        run is slow, so the digest is memoized by (size, mtime).
+        """
+        path = Path(path).resolve()
+        st = path.stat()
+        stamp = [st.st_size, st.st_mtime_ns]
+        memo = self._file_hashes.get(str(path))
+        if memo is not None and memo["stamp"] == stamp:
+            return memo["sha256"]
+
+        digest = hash_file(path)
+        self._file_hashes[str(path)] = {"stamp": stamp, "sha256": digest}
+        self._write_file_hashes()
+        return digest
+
+    def key(self, path, tokenizer, **params):
+        h = hashlib.sha256()
+        h.update(self.content_hash(path).encode())
+        h.update(tokenizer_fingerprint(tokenizer).encode())
+        h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()[:32]
+
+    def _entry(self, key):
+        return self.cache_dir / key
+
+    def load(self, key):
+        """Return (dataset, meta) for a cached entry, or None on a miss."""
+        entry = self._entry(key)
+        meta_path = entry / META_FILE
+        if not meta_path.exists():
+            return None
+        with meta_path.open("r") as f:
+            meta = json.load(f)
+        dataset = load_from_disk(str(entry / "dataset"))
+        # mtime of meta.json is the LRU timestamp
+        os.utime(meta_path)
+        self._pinned.add(key)
+        return dataset, meta
+
+    def store(self, key, dataset, meta):
+        """Save a dataset under key and return the copy loaded back from the cache."""
+        entry = self._entry(key)
+        tmp = self.cache_dir / f".tmp-{key}-{os.getpid()}"
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        dataset.save_to_disk(str(tmp / "dataset"))
+        meta = dict(meta, created=time.time())
+        with (tmp / META_FILE).open("w") as f:
+            json.dump(meta, f, indent=2)
+
+        if entry.exists():
+            shutil.rmtree(entry)
+        os.replace(tmp, entry)
+        self._pinned.add(key)
+
+        self.evict()
+        return load_from_disk(str(entry / "dataset"))
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        if self.max_bytes is None:
+            return
+
+        entries = []
+        for entry in self.cache_dir.iterdir():
+            meta_path = entry / META_FILE
+            if not entry.is_dir() or not meta_path.exists():
+                continue
+            entries.append((meta_path.stat().st_mtime, entry, dir_size(entry)))
+
+        total = sum(size for _, _, size in entries)
+        for _, entry, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry.name in self._pinned:
+                continue
+            print(f"Evicting MLM cache entry {entry.name} ({size / 1e6:.1f} MB)")
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
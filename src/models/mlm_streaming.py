@@ -0,0 +1,150 @@
+"""
+Streaming MLM dataset for corpora that do not fit in RAM.
+
+JSONL files are read line by line (Parquet files batch by batch), tokenized
+in small batches and packed into max_seq_length blocks on the fly, then
+passed through a bounded shuffle buffer. Nothing is materialized up front, so startup time and
+memory stay flat no matter how large train_files gets.
+
+The stream is a pure function of (train_files, tokenizer, seed), so a run
+can resume at any step by skipping the blocks already consumed.
+"""
+
+import itertools
+import json
+from pathlib import Path
+
+import numpy as np
+from torch.utils.data import IterableDataset, get_worker_info
+
+
+def iter_jsonl_texts(files):
+    """Yield the 'text' field of every record, one JSONL line / Parquet record batch at a time."""
+    for file in files:
+        if str(file).endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(file).iter_batches(columns=["text"]):
+                yield from (text for text in batch.column(0).to_pylist() if text)
+            continue
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                text = json.loads(line).get("text")
+                if text:
+                    yield text
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def resume_step(checkpoint_dir):
+    """Global step recorded in a Trainer checkpoint (0 if unknown)."""
+    state_path = Path(checkpoint_dir) / "trainer_state.json"
+    if not state_path.exists():
+        return 0
+    with state_path.open("r") as f:
+        return int(json.load(f).get("global_step", 0))
+
+
+class StreamingMLMDataset(IterableDataset):
+    """
+    Infinite stream of packed MLM blocks.
+
+    Each pass over train_files is one epoch; epoch e shuffles with seed + e.
+    Trainer bounds the run with max_steps. skip_blocks drops the first N
+    blocks of the stream before they reach the collator, which is how a
+    resumed run lands on exactly the blocks it would have seen next.
+    """
+
+    def __init__(
+        self,
+        train_files,
+        tokenizer,
+        max_seq_length,
+        keep_remainder=False,
+        shuffle_buffer_size=10000,
+        seed=42,
+        tokenize_batch_size=1000,
+        skip_blocks=0,
+    ):
+        self.train_files = list(train_files)
+        self.tokenizer = tokenizer
+        self.max_seq_length = max_seq_length
+        self.keep_remainder = keep_remainder
+        self.shuffle_buffer_size = shuffle_buffer_size
+        self.seed = seed
+        self.tokenize_batch_size = tokenize_batch_size
+        self.skip_blocks = skip_blocks
+
+    def iter_blocks(self):
+        """Tokenize and pack the corpus in order, carrying leftovers across batches."""
+        L = self.max_seq_length
+        carry = None
+        for texts in batched(iter_jsonl_texts(self.train_files), self.tokenize_batch_size):
+            enc = self.tokenizer(texts, truncation=True, max_length=L, padding=False)
+            lengths = [len(ids) for ids in enc["input_ids"]]
+            total = sum(lengths)
+
+            flat = {
+                k: np.fromiter(itertools.chain.from_iterable(v), dtype=np.int64, count=total)
+                for k, v in enc.items()
+            }
+            if carry is not None:
+                flat = {k: np.concatenate([carry[k], v]) for k, v in flat.items()}
+
+            n_full = len(flat["input_ids"]) // L
+            for i in range(n_full):
+                yield {k: v[i * L : (i + 1) * L].tolist() for k, v in flat.items()}
+            carry = {k: v[n_full * L :] for k, v in flat.items()}
+
+        if self.keep_remainder and carry is not None and len(carry["input_ids"]) > 0:
+            yield {k: v.tolist() for k, v in carry.items()}
+
+    def shuffle(self, blocks, rng):
+        """Bounded shuffle buffer: memory is shuffle_buffer_size blocks."""
+        if self.shuffle_buffer_size <= 1:
+            yield from blocks
+            return
+
+        buffer = []
+        for block in blocks:
+            if len(buffer) < self.shuffle_buffer_size:
+                buffer.append(block)
+                continue
+            j = rng.integers(len(buffer))
+            yield buffer[j]
+            buffer[j] = block
+
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def __iter__(self):
+        worker = get_worker_info()
+        if worker is not None and worker.num_workers > 1:
+            raise ValueError(
+                "StreamingMLMDataset is a single ordered stream; "
+                "use dataloader_num_workers <= 1."
+            )
+
+        to_skip = self.skip_blocks
+        for epoch in itertools.count():
+            rng = np.random.default_rng(self.seed + epoch)
+            n_yielded = 0
+            for block in self.shuffle(self.iter_blocks(), rng):
+                n_yielded += 1
+                if to_skip > 0:
+                    to_skip -= 1
+                    continue
+                yield block
+
+            if n_yielded == 0:
+                raise ValueError(f"No MLM blocks could be built from {self.train_files}")
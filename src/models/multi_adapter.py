@@ -0,0 +1,217 @@
+"""
+Multi-adapter LoRA serving: resident base model(s), hot-swappable adapters.
+
+The LoRA runs of finetune_sft.py (use_lora: true) save only the adapter
+(adapter_config.json + adapter_model.safetensors). Instead of merging each
+one into its own full BERT, AdapterPool loads every adapter unmerged onto a
+shared base model and switches between them with set_adapter, which is a
+pointer swap, not a weight reload. Each extra adapter costs a few MB.
+
+Adapters must save every module their base checkpoint lacks (finetune_sft.py
+puts e.g. the pooler an MLM checkpoint has no weights for in modules_to_save);
+the pool refuses adapters that don't, since those modules would be random.
+
+Adapters can only share a base they were trained on: adapters whose
+base_model_name_or_path (and tokenizer size) match share one resident copy,
+others get their own. SFT5/SFT6/SFT7 start from different MLM checkpoints,
+so they load as three bases; several adapters on the same MLM base share one.
+
+Each input picks its adapter by an explicit "adapter" field, else by its
+"domain" via --route, else --default.
+
+Usage:
+    python src/models/multi_adapter.py \
+        --adapter sft5=outputs/sft_5_biomed_mlm_with_adapter \
+        --adapter sft6=outputs/sft_6_finance_mlm_with_adapter \
+        --route BIO=sft5 --route FIN=sft6 --default sft6 \
+        --input data/processed/mixed_balanced_test.jsonl --output preds.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import defaultdict
+
+import torch
+from peft import PeftConfig, PeftModel
+from transformers import AutoTokenizer
+
+from predict import (
+    Predictor,
+    check_adapter_restores,
+    checkpoint_label_map,
+    iter_jsonl,
+    load_base_with_missing,
+    prediction_record,
+    report_throughput,
+)
+
+
+def tensor_bytes(params):
+    return sum(p.numel() * p.element_size() for p in params)
+
+
+class AdapterPredictor(Predictor):
+    """Predictor bound to one named adapter of a shared PeftModel."""
+
+    def __init__(self, model, adapter_name, tokenizer, device, max_length, domain_prefix, label2id=None):
+        self.model = model
+        self.adapter_name = adapter_name
+        self.device = device
+        self._init_common(tokenizer, model.config, max_length, domain_prefix, label2id)
+
+    def logits(self, batch_ids):
+        if self.model.active_adapter != self.adapter_name:
+            self.model.set_adapter(self.adapter_name)
+        return super().logits(batch_ids)
+
+
+class AdapterPool:
+    def __init__(self, adapters, device=None, max_length=256, domain_prefix="auto"):
+        """adapters: {name: adapter_dir} of unmerged finetune_sft.py LoRA outputs."""
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.models = {}  # (base path, vocab size) -> PeftModel
+        self.missing = {}  # (base path, vocab size) -> weights its checkpoint lacks
+        self.predictors = {}
+        self.adapter_bytes = {}
+
+        for name, adapter_dir in adapters.items():
+            tokenizer = AutoTokenizer.from_pretrained(adapter_dir, use_fast=True)
+            key = (PeftConfig.from_pretrained(adapter_dir).base_model_name_or_path, len(tokenizer))
+
+            if key not in self.models:
+                base, self.missing[key] = load_base_with_missing(adapter_dir, tokenizer)
+                model = PeftModel.from_pretrained(base, adapter_dir, adapter_name=name)
+                self.models[key] = model.to(self.device).eval()
+                print(f"Loaded base {key[0]} with adapter '{name}'", file=sys.stderr)
+            else:
+                self.models[key].load_adapter(adapter_dir, adapter_name=name)
+                self.models[key].to(self.device).eval()
+                print(f"Added adapter '{name}' to resident base {key[0]}", file=sys.stderr)
+
+            model = self.models[key]
+            # every adapter on a shared base must bring its own copy of what the base lacks
+            # (e.g. the pooler of an MLM checkpoint); otherwise it would run on random weights
+            check_adapter_restores(model, adapter_dir, self.missing[key], name)
+            self.adapter_bytes[name] = tensor_bytes(
+                p for n, p in model.named_parameters() if f".{name}." in n or n.endswith(f".{name}")
+            )
+            self.predictors[name] = AdapterPredictor(
+                model, name, tokenizer, self.device, max_length, domain_prefix, checkpoint_label_map(adapter_dir)
+            )
+
+    def __getitem__(self, name):
+        return self.predictors[name]
+
+    def memory_report(self):
+        lines = []
+        for key, model in self.models.items():
+            base = tensor_bytes(p for n, p in model.named_parameters() if "lora_" not in n and "modules_to_save" not in n)
+            lines.append(f"base {key[0]}: {base / 1e6:.1f} MB")
+        for name, size in self.adapter_bytes.items():
+            lines.append(f"  adapter {name}: {size / 1e6:.2f} MB")
+        return "\n".join(lines)
+
+
+def choose_adapter(record, routes, default):
+    if record.get("adapter"):
+        return record["adapter"]
+    return routes.get(record.get("domain"), default)
+
+
+def iter_routed_predictions(records, pool, routes, default, batch_size=32, sort_window=2048, stats=None):
+    """
+    Like predict.iter_predictions, but every record is scored by its own adapter.
+    Records of a window are grouped per adapter (one switch per group) and
+    yielded back in input order as (record, adapter_name, probs).
+    """
+    records = iter(records)
+    while True:
+        window = list(itertools.islice(records, sort_window))
+        if not window:
+            return
+
+        start = time.perf_counter()
+        groups = defaultdict(list)
+        for i, record in enumerate(window):
+            name = choose_adapter(record, routes, default)
+            if name not in pool.predictors:
+                raise ValueError(f"No adapter named {name!r} for record {i} (have {sorted(pool.predictors)})")
+            groups[name].append(i)
+
+        results = [None] * len(window)
+        n_tokens = 0
+        for name, idx in groups.items():
+            predictor = pool[name]
+            input_ids = predictor.encode([predictor.prepare(window[i]) for i in idx])
+            n_tokens += sum(len(ids) for ids in input_ids)
+            for i, p in zip(idx, predictor.score(input_ids, batch_size=batch_size)):
+                results[i] = (name, p)
+
+        if stats is not None:
+            stats["examples"] = stats.get("examples", 0) + len(window)
+            stats["tokens"] = stats.get("tokens", 0) + n_tokens
+            stats["seconds"] = stats.get("seconds", 0.0) + time.perf_counter() - start
+
+        for record, (name, p) in zip(window, results):
+            yield record, name, p
+
+
+def parse_pairs(pairs, what):
+    out = {}
+    for pair in pairs or []:
+        if "=" not in pair:
+            raise ValueError(f"Expected NAME=VALUE for {what}, got {pair!r}")
+        k, v = pair.split("=", 1)
+        out[k] = v
+    return out
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve several LoRA adapters on shared base models")
+    parser.add_argument("--adapter", action="append", required=True, help="NAME=ADAPTER_DIR (repeatable)")
+    parser.add_argument("--route", action="append", help="DOMAIN=NAME, e.g. FIN=sft6 (repeatable)")
+    parser.add_argument("--default", type=str, default=None, help="Adapter for records with no route")
+    parser.add_argument("--input", type=str, required=True)
+    parser.add_argument("--output", type=str, default="-")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=256)
+    parser.add_argument("--sort_window", type=int, default=2048)
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--domain_prefix", choices=["auto", "on", "off"], default="auto")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    adapters = parse_pairs(args.adapter, "--adapter")
+    routes = parse_pairs(args.route, "--route")
+    default = args.default or next(iter(adapters))
+
+    pool = AdapterPool(adapters, args.device, args.max_length, args.domain_prefix)
+    print(pool.memory_report(), file=sys.stderr)
+
+    stats = {}
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record, name, probs in iter_routed_predictions(
+            iter_jsonl(args.input), pool, routes, default, args.batch_size, args.sort_window, stats
+        ):
+            rec = prediction_record(record, probs, pool[name].id2label)
+            rec["adapter"] = name
+            out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    report_throughput(stats)
+
+
+if __name__ == "__main__":
+    main()
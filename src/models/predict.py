@@ -0,0 +1,448 @@
+"""
+Streaming batch inference for fine-tuned SFT checkpoints.
+
+Reads a JSONL file of any size ({"text": ..., optional "domain": "FIN"/"BIO"}),
+sorts each window of inputs by token length so batches carry little padding,
+runs the model under torch.inference_mode, and writes one JSONL prediction
+per input, in input order:
+
+    {..original fields.., "pred_label": 2, "pred_name": "positive", "probs": [...]}
+
+--model_dir may be a full fine-tune, an unmerged LoRA adapter, an int8
+export from quantize.py or an ONNX export from export_onnx.py (run with
+ONNX Runtime on CPU).
+
+Usage:
+    python src/models/predict.py --model_dir outputs/sft_4_mixed_mlm_no_adapter \
+        --input data/processed/mixed_balanced_test.jsonl --output preds.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from prediction_cache import cache_key, make_prediction_cache
+
+# the label map helpers live with the ingestion scripts in src/data
+sys.path.append(str(Path(__file__).resolve().parents[1] / "data"))
+from parquet_io import label_id, load_label_map  # noqa: E402
+
+
+DOMAIN_TOKENS = {"FIN": "[FIN]", "BIO": "[BIO]"}
+
+ADAPTER_CONFIG = "adapter_config.json"
+LABEL_MAP = "label_map.json"
+QUANTIZED_META = "quantization.json"
+QUANTIZED_WEIGHTS = "model_int8.pt"
+ONNX_MODEL = "model.onnx"
+
+
+def add_domain_prefix(text, domain):
+    """Prepend [FIN]/[BIO] like the SFT notebooks do; unknown domains are left as-is."""
+    prefix = DOMAIN_TOKENS.get(domain)
+    return f"{prefix} {text}" if prefix else text
+
+
+def has_domain_tokens(tokenizer):
+    vocab = tokenizer.get_vocab()
+    return all(tok in vocab for tok in DOMAIN_TOKENS.values())
+
+
+def iter_jsonl(path):
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def to_label_id(label, label2id=None):
+    """
+    Gold labels come as 0/1/2 or "negative"/"neutral"/"positive" depending on
+    the file; resolved through label2id (default: data/processed/label_map.json).
+    """
+    return label_id(label, label2id)
+
+
+def checkpoint_label_map(model_dir=None, config=None):
+    """
+    name -> id a checkpoint was trained with: the label_map.json finetune_sft.py
+    saves next to it, else the names in its config, else data/processed/label_map.json
+    (what every SFT config trains with).
+    """
+    if model_dir is not None and (Path(model_dir) / LABEL_MAP).exists():
+        return load_label_map(Path(model_dir) / LABEL_MAP)
+    if config is not None and not all(v == f"LABEL_{k}" for k, v in config.id2label.items()):
+        return {name.lower(): int(i) for name, i in config.label2id.items()}
+    return load_label_map()
+
+
+def save_label_map(label2id, out_dir):
+    with (Path(out_dir) / LABEL_MAP).open("w", encoding="utf-8") as f:
+        json.dump(label2id, f, indent=2)
+
+
+def adapter_num_labels(model_dir):
+    """Number of classes in the classifier head saved next to a LoRA adapter."""
+    from safetensors import safe_open
+
+    path = Path(model_dir) / "adapter_model.safetensors"
+    with safe_open(str(path), "pt") as f:
+        for key in f.keys():
+            if key.endswith("classifier.weight"):
+                return f.get_slice(key).get_shape()[0]
+    raise ValueError(f"No classifier head found in {path}")
+
+
+def newly_initialized_weights(loading_info):
+    """Weights from_pretrained had to initialize randomly (missing from the checkpoint or resized)."""
+    return sorted(set(loading_info["missing_keys"]) | {k for k, *_ in loading_info["mismatched_keys"]})
+
+
+def restored_weight(params, weight, adapter_name):
+    """The parameter a loaded PeftModel uses for base weight, if a modules_to_save copy replaces it."""
+    parts = weight.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        name = ".".join(["base_model.model", *parts[:i], "modules_to_save", adapter_name, *parts[i:]])
+        if name in params:
+            return params[name]
+    return None
+
+
+def check_adapter_restores(model, model_dir, weights, adapter_name="default"):
+    """
+    Raise unless every weight the base checkpoint lacks is replaced, in the
+    loaded model, by the copy the adapter saved (modules_to_save).
+
+    E.g. an MLM checkpoint has no pooler: unless the adapter saved one and it
+    was loaded, the pooler is random on every load and the predictions are
+    meaningless.
+    """
+    from peft import PeftConfig
+    from safetensors import safe_open
+
+    params = dict(model.named_parameters())
+    unrestored = []
+    with safe_open(str(Path(model_dir) / "adapter_model.safetensors"), "pt") as f:
+        saved = set(f.keys())
+        for w in weights:
+            param = restored_weight(params, w, adapter_name)
+            key = f"base_model.model.{w}"
+            if param is None or key not in saved or not torch.equal(param.detach().cpu(), f.get_tensor(key)):
+                unrestored.append(w)
+    if unrestored:
+        base = PeftConfig.from_pretrained(model_dir).base_model_name_or_path
+        raise ValueError(
+            f"{model_dir}: {base} has no weights for {unrestored} and the adapter does not restore them, "
+            "so they would be randomly initialized. Retrain it with finetune_sft.py, which now saves "
+            "those modules with the adapter."
+        )
+
+
+def load_base_with_missing(model_dir, tokenizer):
+    """(base model, weights its checkpoint did not provide) for a LoRA adapter, sized for its head and tokenizer."""
+    from peft import PeftConfig
+
+    peft_cfg = PeftConfig.from_pretrained(model_dir)
+    base, loading_info = AutoModelForSequenceClassification.from_pretrained(
+        peft_cfg.base_model_name_or_path,
+        num_labels=adapter_num_labels(model_dir),
+        ignore_mismatched_sizes=True,
+        output_loading_info=True,
+    )
+    if base.get_input_embeddings().num_embeddings != len(tokenizer):
+        base.resize_token_embeddings(len(tokenizer))
+    return base, newly_initialized_weights(loading_info)
+
+
+def load_adapter_model(model_dir, tokenizer):
+    """
+    An unmerged LoRA adapter on its base: the model exactly as finetune_sft.py
+    trained it. Raises if the adapter can't fill in what its base lacks.
+    """
+    from peft import PeftModel
+
+    base, missing = load_base_with_missing(model_dir, tokenizer)
+    model = PeftModel.from_pretrained(base, str(model_dir))
+    check_adapter_restores(model, model_dir, missing)
+    return model
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations quantized on the fly)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized_model(model_dir):
+    config = AutoConfig.from_pretrained(model_dir)
+    model = quantize_dynamic_int8(AutoModelForSequenceClassification.from_config(config).eval())
+    state = torch.load(Path(model_dir) / QUANTIZED_WEIGHTS, map_location="cpu", weights_only=False)
+    model.load_state_dict(state)
+    return model
+
+
+def load_model(model_dir, tokenizer):
+    """
+    Load any finetune_sft.py output as a plain classifier:
+      - full fine-tunes (config.json + weights)
+      - unmerged LoRA adapters (adapter_config.json), merged into their base here
+      - int8 exports from quantize.py (quantization.json)
+    """
+    model_dir = Path(model_dir)
+    if (model_dir / QUANTIZED_META).exists():
+        return load_quantized_model(model_dir)
+    if is_adapter(model_dir):
+        return load_adapter_model(model_dir, tokenizer).merge_and_unload()
+    return AutoModelForSequenceClassification.from_pretrained(model_dir)
+
+
+def is_adapter(model_dir):
+    return (Path(model_dir) / ADAPTER_CONFIG).exists()
+
+
+def is_quantized(model_dir):
+    return (Path(model_dir) / QUANTIZED_META).exists()
+
+
+class Predictor:
+    """Wraps a tokenizer + sequence-classification model for batched scoring."""
+
+    def __init__(self, model, tokenizer, device="cpu", max_length=256, domain_prefix="auto", label2id=None):
+        self.model = model.to(device).eval()
+        self.device = device
+        self._init_common(tokenizer, model.config, max_length, domain_prefix, label2id)
+
+    def _init_common(self, tokenizer, config, max_length, domain_prefix, label2id=None):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        if domain_prefix == "auto":
+            self.use_domain_prefix = has_domain_tokens(tokenizer)
+        else:
+            self.use_domain_prefix = domain_prefix == "on"
+        self.label2id = label2id or checkpoint_label_map(config=config)
+        if len(self.label2id) != config.num_labels:
+            raise ValueError(f"Label map {self.label2id} does not match the model's {config.num_labels} classes")
+        self.id2label = {i: name for name, i in self.label2id.items()}
+
+    def prepare(self, record):
+        text = record["text"]
+        if self.use_domain_prefix:
+            text = add_domain_prefix(text, record.get("domain"))
+        return text
+
+    def encode(self, texts):
+        """Tokenize without padding; batches are padded later, after length sorting."""
+        return self.tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+
+    def pad(self, batch_ids):
+        """Right-pad a list of id lists into input_ids / attention_mask arrays."""
+        max_len = max(len(ids) for ids in batch_ids)
+        input_ids = np.full((len(batch_ids), max_len), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch_ids), max_len), dtype=np.int64)
+        for row, ids in enumerate(batch_ids):
+            input_ids[row, : len(ids)] = ids
+            attention_mask[row, : len(ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    def logits(self, batch_ids):
+        features = {k: torch.from_numpy(v).to(self.device) for k, v in self.pad(batch_ids).items()}
+        with torch.inference_mode():
+            return self.model(**features).logits.float().cpu().numpy()
+
+    def score(self, input_ids, batch_size=32):
+        """
+        Probabilities for a list of encoded inputs, returned in the given order.
+        Inputs are run longest-first in length-sorted batches.
+        """
+        order = np.argsort([-len(ids) for ids in input_ids], kind="stable")
+        probs = np.empty((len(input_ids), len(self.id2label)), dtype=np.float32)
+        for i in range(0, len(order), batch_size):
+            idx = order[i : i + batch_size]
+            logits = self.logits([input_ids[j] for j in idx])
+            probs[idx] = torch.softmax(torch.from_numpy(logits), dim=-1).numpy()
+        return probs
+
+
+class OnnxPredictor(Predictor):
+    """Same interface as Predictor, backed by an ONNX Runtime CPU session (export_onnx.py)."""
+
+    def __init__(self, model_dir, tokenizer, max_length=256, domain_prefix="auto", num_threads=None, label2id=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(Path(model_dir) / ONNX_MODEL), options, providers=["CPUExecutionProvider"]
+        )
+        self.model = None
+        self.device = "cpu"
+        config = AutoConfig.from_pretrained(model_dir)
+        self._init_common(
+            tokenizer, config, max_length, domain_prefix, label2id or checkpoint_label_map(model_dir, config)
+        )
+
+    def logits(self, batch_ids):
+        return self.session.run(["logits"], self.pad(batch_ids))[0]
+
+
+def is_onnx(model_dir):
+    return (Path(model_dir) / ONNX_MODEL).exists()
+
+
+def load_predictor(model_dir, device=None, max_length=256, domain_prefix="auto", num_threads=None):
+    if is_onnx(model_dir):
+        tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+        return OnnxPredictor(model_dir, tokenizer, max_length, domain_prefix, num_threads)
+    if is_quantized(model_dir):
+        device = "cpu"  # dynamic int8 kernels are CPU-only
+    device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+    model = load_model(model_dir, tokenizer)
+    label2id = checkpoint_label_map(model_dir, model.config)
+    return Predictor(model, tokenizer, device, max_length, domain_prefix, label2id)
+
+
+def score_with_cache(records, predictor, cache, batch_size=32):
+    """
+    Probabilities for records, scoring only texts the cache (prediction_cache.py)
+    doesn't have; duplicates within records are scored once.
+    Returns (probs, input_ids of the scored texts).
+    """
+    keys = [cache_key(r, predictor.use_domain_prefix) for r in records]
+    found = cache.get_many(keys)
+
+    todo = {}  # key -> first record index with that key
+    for i, k in enumerate(keys):
+        if k not in found and k not in todo:
+            todo[k] = i
+    input_ids = []
+    if todo:
+        input_ids = predictor.encode([predictor.prepare(records[i]) for i in todo.values()])
+        scored = predictor.score(input_ids, batch_size=batch_size)
+        cache.put_many(zip(todo, scored))
+        found.update(zip(todo, scored))
+    return np.stack([found[k] for k in keys]), input_ids
+
+
+def iter_predictions(records, predictor, batch_size=32, sort_window=2048, stats=None, cache=None):
+    """
+    Yield (record, probs) for every input record, in input order.
+
+    Only sort_window records are held at a time, so input size is unbounded.
+    stats (optional dict) accumulates examples / tokens / seconds.
+    cache (optional PredictionCache) skips texts already scored by this model.
+    """
+    records = iter(records)
+    while True:
+        window = list(itertools.islice(records, sort_window))
+        if not window:
+            return
+
+        start = time.perf_counter()
+        if cache is not None:
+            probs, input_ids = score_with_cache(window, predictor, cache, batch_size)
+        else:
+            input_ids = predictor.encode([predictor.prepare(r) for r in window])
+            probs = predictor.score(input_ids, batch_size=batch_size)
+        if stats is not None:
+            stats["examples"] = stats.get("examples", 0) + len(window)
+            stats["tokens"] = stats.get("tokens", 0) + sum(len(ids) for ids in input_ids)
+            stats["seconds"] = stats.get("seconds", 0.0) + time.perf_counter() - start
+
+        for record, p in zip(window, probs):
+            yield record, p
+
+
+def prediction_record(record, probs, id2label):
+    pred = int(np.argmax(probs))
+    out = dict(record)
+    out["pred_label"] = pred
+    out["pred_name"] = id2label.get(pred, str(pred))
+    out["probs"] = [round(float(p), 6) for p in probs]
+    return out
+
+
+def report_throughput(stats):
+    seconds = max(stats.get("seconds", 0.0), 1e-9)
+    print(
+        f"Scored {stats.get('examples', 0)} examples in {seconds:.2f}s: "
+        f"{stats.get('examples', 0) / seconds:.1f} examples/s, "
+        f"{stats.get('tokens', 0) / seconds:.0f} tokens/s",
+        file=sys.stderr,
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Batch inference for SFT checkpoints")
+    parser.add_argument("--model_dir", type=str, required=True)
+    parser.add_argument("--input", type=str, required=True, help="JSONL with a 'text' field ('-' for stdin)")
+    parser.add_argument("--output", type=str, default="-", help="Output JSONL ('-' for stdout)")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=256)
+    parser.add_argument("--sort_window", type=int, default=2048, help="Inputs sorted by length per window")
+    parser.add_argument("--num_threads", type=int, default=None, help="CPU threads (torch / onnxruntime)")
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument(
+        "--domain_prefix",
+        choices=["auto", "on", "off"],
+        default="auto",
+        help="Prepend [FIN]/[BIO] from the 'domain' field (auto: if the tokenizer has those tokens)",
+    )
+    parser.add_argument("--cache_size", type=int, default=0, help="In-memory prediction cache entries (0: off)")
+    parser.add_argument("--cache_db", type=str, default=None, help="SQLite file persisting cached predictions")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    predictor = load_predictor(
+        args.model_dir, args.device, args.max_length, args.domain_prefix, args.num_threads
+    )
+    backend = "onnxruntime" if isinstance(predictor, OnnxPredictor) else "torch"
+    print(
+        f"Loaded {args.model_dir} on {predictor.device} via {backend} "
+        f"(domain prefix: {'on' if predictor.use_domain_prefix else 'off'}, "
+        f"threads: {torch.get_num_threads()})",
+        file=sys.stderr,
+    )
+
+    cache = None
+    if args.cache_size or args.cache_db:
+        cache = make_prediction_cache(args.model_dir, predictor, args.cache_size or 100_000, args.cache_db)
+
+    stats = {}
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record, probs in iter_predictions(
+            iter_jsonl(args.input), predictor, args.batch_size, args.sort_window, stats, cache
+        ):
+            out.write(json.dumps(prediction_record(record, probs, predictor.id2label), ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+
+    report_throughput(stats)
+    if cache is not None:
+        print(f"Prediction cache: {json.dumps(cache.report())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Two-tier prediction cache for SFT inference.
+
+Inputs are heavily duplicated (retweeted headlines, boilerplate drug reviews),
+so probabilities are cached per normalized text. normalize() is imported from
+src/data/text_norm.py, the helper the ingestion scripts dedupe with, so texts
+those scripts treat as one row also share one cache entry.
+
+  tier 1: in-process LRU, bounded by entry count
+  tier 2: optional SQLite file, persists across runs and processes
+
+Every entry is stored under a model fingerprint (content hash of the model
+directory, and for a LoRA adapter of the base checkpoint it loads onto, plus
+max_length and the domain-prefix setting), so scoring with a new checkpoint
+never returns another model's predictions; old entries simply stop matching.
+
+The public methods take a lock, so serve.py can score (and fill the cache) on
+an executor thread while the event loop reads stats from another.
+
+Usage (predict.py / serve.py):
+    --cache_size 100000 --cache_db cache/predictions.sqlite
+"""
+
+import hashlib
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "data"))
+from text_norm import normalize  # noqa: E402
+
+
+def resolve_model_dir(name_or_path):
+    """The directory from_pretrained reads name_or_path from (a hub id: its snapshot in the local HF cache)."""
+    if Path(name_or_path).is_dir():
+        return Path(name_or_path)
+    from huggingface_hub import try_to_load_from_cache
+
+    config = try_to_load_from_cache(name_or_path, "config.json")
+    if not isinstance(config, str):
+        raise ValueError(f"Cannot fingerprint {name_or_path}: not a local directory or a cached hub model")
+    return Path(config).parent
+
+
+def hash_files(h, model_dir):
+    for path in sorted(p for p in Path(model_dir).iterdir() if p.is_file()):
+        h.update(path.name.encode())
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+
+def model_fingerprint(model_dir, max_length, use_domain_prefix):
+    """
+    Hash every file of the model directory (weights, config, tokenizer) plus the
+    scoring settings. A LoRA adapter's predictions also depend on its base
+    checkpoint, so that directory is hashed too: retraining the base at the
+    same path invalidates the adapter's entries.
+    """
+    h = hashlib.sha256()
+    hash_files(h, model_dir)
+    if (Path(model_dir) / "adapter_config.json").exists():
+        from peft import PeftConfig
+
+        base = PeftConfig.from_pretrained(str(model_dir)).base_model_name_or_path
+        h.update(f"base={base}".encode())
+        hash_files(h, resolve_model_dir(base))
+    h.update(f"max_length={max_length};domain_prefix={bool(use_domain_prefix)}".encode())
+    return h.hexdigest()[:32]
+
+
+def cache_key(record, use_domain_prefix):
+    text = normalize(record.get("text"))
+    if use_domain_prefix:
+        # the [FIN]/[BIO] prefix changes the model input, so the domain is part of the key
+        text = f"{record.get('domain') or ''}\t{text}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, fingerprint, max_entries=100_000, db_path=None):
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.lru = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+        self.lock = threading.Lock()  # guards the LRU, the stats and the sqlite connection
+
+        self.db = None
+        if db_path:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, probs BLOB NOT NULL, "
+                "PRIMARY KEY (model, key)) WITHOUT ROWID"
+            )
+
+    def _remember(self, key, probs):
+        self.lru[key] = probs
+        self.lru.move_to_end(key)
+        while len(self.lru) > self.max_entries:
+            self.lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_many(self, keys):
+        """Return {key: probs} for the keys found in either tier."""
+        with self.lock:
+            return self._get_many(keys)
+
+    def _get_many(self, keys):
+        found = {}
+        missing = []
+        for k in keys:
+            if k in self.lru:
+                self.lru.move_to_end(k)
+                found[k] = self.lru[k]
+                self.stats["memory_hits"] += 1
+            else:
+                missing.append(k)
+
+        if self.db is not None and missing:
+            unique = list(dict.fromkeys(missing))
+            for i in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+                chunk = unique[i : i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, probs FROM predictions WHERE model = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [self.fingerprint, *chunk],
+                ).fetchall()
+                for k, blob in rows:
+                    probs = np.frombuffer(blob, dtype=np.float32)
+                    found[k] = probs
+                    self._remember(k, probs)
+            self.stats["disk_hits"] += sum(1 for k in missing if k in found)
+
+        self.stats["misses"] += sum(1 for k in missing if k not in found)
+        return found
+
+    def put_many(self, items):
+        """items: iterable of (key, probs)."""
+        with self.lock:
+            self._put_many(items)
+
+    def _put_many(self, items):
+        rows = []
+        for k, probs in items:
+            probs = np.asarray(probs, dtype=np.float32)
+            self._remember(k, probs)
+            rows.append((self.fingerprint, k, probs.tobytes()))
+        if self.db is not None and rows:
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)", rows)
+        self.stats["writes"] += len(rows)
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def report(self):
+        with self.lock:
+            return {**self.stats, "hit_rate": self.hit_rate(), "entries_in_memory": len(self.lru)}
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+
+def make_prediction_cache(model_dir, predictor, max_entries, db_path=None):
+    fingerprint = model_fingerprint(model_dir, predictor.max_length, predictor.use_domain_prefix)
+    return PredictionCache(fingerprint, max_entries, db_path)
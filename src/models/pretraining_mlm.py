@@ -1,9 +1,11 @@
 import argparse
 import json
+import os
 from pathlib import Path
 
 
-
+import numpy as np
+import pyarrow as pa
 import yaml
 from datasets import load_dataset, concatenate_datasets
 from transformers import (
@@ -14,6 +16,19 @@ from transformers import (
     TrainingArguments,
 )
 
+from transformers.trainer_utils import get_last_checkpoint
+
+from mlm_cache import MLMDatasetCache
+from mlm_streaming import StreamingMLMDataset, resume_step
+from token_store import (
+    MemmapTokenDataset,
+    export_token_store,
+    read_store_meta,
+    source_stamp,
+)
+from telemetry import TELEMETRY_FILE, Telemetry, TelemetryCallback
+from utils import default_num_proc
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Domain-adaptive MLM training")
@@ -32,24 +47,44 @@ def load_config(path):
 
 
 
-def load_mlm_dataset(train_files, tokenizer, max_seq_length):
+def pack_token_blocks(batch, max_seq_length, keep_remainder=False):
     """
-    train_files: list of JSONL files, each with a 'text' field.
-    Returns a tokenized dataset ready for MLM.
+    Concatenate every token column of an Arrow batch and cut it into
+    fixed-size blocks of max_seq_length tokens.
+
+    The flattened list values are already one contiguous Arrow buffer, so the
+    blocks are just new offsets over it (no Python-level list concatenation).
+    With keep_remainder=True the trailing partial block is kept instead of dropped.
     """
-    # Load all JSONL files and concatenate into one dataset
-    datasets = []
-    for file in train_files:
-        print(f"Loading {file} ...")
-        ds = load_dataset("json", data_files=file, split="train")
-        datasets.append(ds)
+    columns = {
+        name: batch.column(name).combine_chunks().flatten()
+        for name in batch.column_names
+    }
+    total_length = len(columns["input_ids"])
 
-    if len(datasets) == 1:
-        raw_dataset = datasets[0]
-    else:
-        raw_dataset = concatenate_datasets(datasets)
+    if not keep_remainder:
+        # Drop remainder
+        total_length = (total_length // max_seq_length) * max_seq_length
 
-    print("Total samples:", len(raw_dataset))
+    offsets = np.append(
+        np.arange(0, total_length, max_seq_length, dtype=np.int32),
+        np.int32(total_length),
+    )
+    offsets = pa.array(offsets, type=pa.int32())
+
+    return pa.table(
+        {
+            name: pa.ListArray.from_arrays(offsets, values.slice(0, total_length))
+            for name, values in columns.items()
+        }
+    )
+
+
+def tokenize_and_pack(
+    raw_dataset, tokenizer, max_seq_length, keep_remainder=False, num_proc=1, telemetry=None, **fields
+):
+    """Tokenize a raw 'text' dataset and pack it into max_seq_length blocks."""
+    telemetry = telemetry or Telemetry()
 
     # Tokenize text
     def tokenize_fn(examples):
@@ -61,40 +96,132 @@ def load_mlm_dataset(train_files, tokenizer, max_seq_length):
         )
 
 
-    tokenized = raw_dataset.map(
-        tokenize_fn,
-        batched=True,
-        num_proc=1,
-        remove_columns=raw_dataset.column_names,  # ⬅ drop *all* original columns, including "text"
-    )   
+    with telemetry.phase("tokenize", rows=len(raw_dataset), num_proc=num_proc, **fields):
+        tokenized = raw_dataset.map(
+            tokenize_fn,
+            batched=True,
+            num_proc=num_proc,
+            remove_columns=raw_dataset.column_names,  # ⬅ drop *all* original columns, including "text"
+        )
 
 
-    # Group into chunks for MLM (continuous segments up to max_seq_length)
-    def group_texts(examples):
-        # Concatenate all token lists
-        concatenated = {k: sum(examples[k], []) for k in examples.keys()}
-        total_length = len(concatenated["input_ids"])
+    # Group into chunks for MLM (continuous segments up to max_seq_length).
+    # Packing stays single-process: sharding would move batch boundaries and
+    # change which tail tokens are dropped.
+    with telemetry.phase("pack", **fields):
+        return tokenized.with_format("arrow").map(
+            pack_token_blocks,
+            batched=True,
+            num_proc=1,
+            fn_kwargs={"max_seq_length": max_seq_length, "keep_remainder": keep_remainder},
+        ).with_format(None)
 
-        # Drop remainder
-        total_length = (total_length // max_seq_length) * max_seq_length
 
-        result = {
-            k: [t[i : i + max_seq_length] for i in range(0, total_length, max_seq_length)]
-            for k, t in concatenated.items()
-        }
-        return result
+def load_mlm_dataset(
+    train_files, tokenizer, max_seq_length, keep_remainder=False, cache=None, num_proc=1, telemetry=None
+):
+    """
+    train_files: list of JSONL or Parquet files, each with a 'text' field.
+    Returns a tokenized dataset ready for MLM.
 
-    lm_dataset = tokenized.map(
-        group_texts,
-        batched=True,
-        num_proc=1,
-    )
-    
+    Each file is tokenized and packed on its own, so with a MLMDatasetCache
+    only files whose content (or tokenizer / max_seq_length) changed are
+    re-processed; the rest load straight from disk.
+    """
+    telemetry = telemetry or Telemetry()
+    datasets = []
+    total_samples = 0
+    for file in train_files:
+        key = None
+        if cache is not None:
+            key = cache.key(
+                file,
+                tokenizer,
+                max_seq_length=max_seq_length,
+                keep_remainder=keep_remainder,
+            )
+            hit = cache.load(key)
+            if hit is not None:
+                ds, meta = hit
+                print(f"Loaded {file} from cache ({len(ds)} chunks)")
+                datasets.append(ds)
+                total_samples += meta["num_samples"]
+                continue
+
+        print(f"Loading {file} ...")
+        builder = "parquet" if str(file).endswith(".parquet") else "json"
+        with telemetry.phase("load_data", file=str(file)):
+            raw = load_dataset(builder, data_files=file, split="train")
+        ds = tokenize_and_pack(
+            raw,
+            tokenizer,
+            max_seq_length,
+            keep_remainder,
+            num_proc=min(num_proc, len(raw)),
+            telemetry=telemetry,
+            file=str(file),
+        )
+        if cache is not None:
+            ds = cache.store(key, ds, {"file": str(file), "num_samples": len(raw)})
+        datasets.append(ds)
+        total_samples += len(raw)
+
+    print("Total samples:", total_samples)
+
+    # Concatenate all packed files into one dataset
+    if len(datasets) == 1:
+        lm_dataset = datasets[0]
+    else:
+        lm_dataset = concatenate_datasets(datasets)
 
     print("MLM dataset size (number of chunks):", len(lm_dataset))
     return lm_dataset
 
 
+def make_dataset_cache(config):
+    """Optional per-file cache of tokenized + packed datasets."""
+    if not config.get("dataset_cache_dir"):
+        return None
+    max_gb = config.get("dataset_cache_max_gb")
+    return MLMDatasetCache(
+        config["dataset_cache_dir"],
+        max_bytes=int(float(max_gb) * 1e9) if max_gb is not None else None,
+    )
+
+
+def build_token_store(config, tokenizer, telemetry=None):
+    """
+    Return a MemmapTokenDataset for config["token_store"], (re)exporting it
+    first if it is missing or was built from different inputs.
+    """
+    prefix = config["token_store"]
+    train_files = config["train_files"]
+    max_seq_length = config.get("max_seq_length", 128)
+    keep_remainder = bool(config.get("keep_remainder", False))
+
+    stamp = source_stamp(
+        train_files, tokenizer, max_seq_length=max_seq_length, keep_remainder=keep_remainder
+    )
+    meta = read_store_meta(prefix)
+    if meta is not None and meta.get("stamp") == stamp:
+        print(f"Using token store {prefix} ({meta['num_blocks']} blocks)")
+        return MemmapTokenDataset(prefix)
+
+    print(f"Building token store {prefix} ...")
+    lm_dataset = load_mlm_dataset(
+        train_files,
+        tokenizer,
+        max_seq_length,
+        keep_remainder=keep_remainder,
+        cache=make_dataset_cache(config),
+        num_proc=int(config.get("num_proc") or default_num_proc()),
+        telemetry=telemetry,
+    )
+    with (telemetry or Telemetry()).phase("export_token_store", blocks=len(lm_dataset)):
+        export_token_store(lm_dataset, prefix, len(tokenizer), stamp=stamp)
+    return MemmapTokenDataset(prefix)
+
+
 def main():
     args = parse_args()
     config = load_config(args.config)
@@ -104,14 +231,77 @@ def main():
     output_dir = config["output_dir"]
     max_seq_length = config.get("max_seq_length", 128)
     mlm_probability = config.get("mlm_probability", 0.15)
+    keep_remainder = bool(config.get("keep_remainder", False))
+    streaming = bool(config.get("streaming", False))
+    per_device_train_batch_size = int(config.get("per_device_train_batch_size", 8))
+    gradient_accumulation_steps = int(config.get("gradient_accumulation_steps", 1))
+    seed = int(config.get("seed", 42))
+    num_proc = int(config.get("num_proc") or default_num_proc())
+
+    # Phase timings, throughput and peak memory, next to mlm_config_used.json
+    telemetry = Telemetry(Path(output_dir) / TELEMETRY_FILE)
+    telemetry.start(
+        "pretraining_mlm",
+        args.config,
+        streaming=streaming,
+        token_store=config.get("token_store"),
+        num_proc=num_proc,
+        dataloader_num_workers=int(config.get("dataloader_num_workers", 0)),
+    )
+
+    # resume_from_checkpoint: a checkpoint path, or true for the latest one in output_dir
+    resume_from_checkpoint = config.get("resume_from_checkpoint")
+    if resume_from_checkpoint is True:
+        resume_from_checkpoint = (
+            get_last_checkpoint(output_dir) if Path(output_dir).is_dir() else None
+        )
+    if resume_from_checkpoint:
+        print("Resuming from checkpoint:", resume_from_checkpoint)
 
     # Load tokenizer and model
     print(f"Loading tokenizer and model from {model_name_or_path} ...")
-    tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, use_fast=True)
-    model = AutoModelForMaskedLM.from_pretrained(model_name_or_path)
+    with telemetry.phase("load_model"):
+        tokenizer = AutoTokenizer.from_pretrained(model_name_or_path, use_fast=True)
+        model = AutoModelForMaskedLM.from_pretrained(model_name_or_path)
 
     # Load dataset
-    train_dataset = load_mlm_dataset(train_files, tokenizer, max_seq_length)
+    if streaming:
+        # The stream skips the blocks a resumed run already trained on,
+        # so Trainer must not skip batches itself (ignore_data_skip below).
+        # One optimizer step consumes batch size x accumulation steps x ranks
+        # blocks (Trainer's total_train_batch_size).
+        skip_blocks = 0
+        if resume_from_checkpoint:
+            world_size = int(os.environ.get("WORLD_SIZE", 1))
+            skip_blocks = (
+                resume_step(resume_from_checkpoint)
+                * per_device_train_batch_size
+                * gradient_accumulation_steps
+                * world_size
+            )
+        train_dataset = StreamingMLMDataset(
+            train_files,
+            tokenizer,
+            max_seq_length,
+            keep_remainder=keep_remainder,
+            shuffle_buffer_size=int(config.get("shuffle_buffer_size", 10000)),
+            seed=seed,
+            skip_blocks=skip_blocks,
+        )
+        print(f"Streaming MLM blocks from {len(train_files)} files (skipping {skip_blocks})")
+    elif config.get("token_store"):
+        # Zero-copy reads from a memmap'd .bin shared through the page cache
+        train_dataset = build_token_store(config, tokenizer, telemetry)
+    else:
+        train_dataset = load_mlm_dataset(
+            train_files,
+            tokenizer,
+            max_seq_length,
+            keep_remainder=keep_remainder,
+            cache=make_dataset_cache(config),
+            num_proc=num_proc,
+            telemetry=telemetry,
+        )
 
     # Data collator for MLM
     data_collator = DataCollatorForLanguageModeling(
@@ -124,14 +314,18 @@ def main():
     training_args = TrainingArguments(
         output_dir=output_dir,
         max_steps=int(config.get("max_steps", 1000)),
-        per_device_train_batch_size=int(config.get("per_device_train_batch_size", 8)),
+        per_device_train_batch_size=per_device_train_batch_size,
+        gradient_accumulation_steps=gradient_accumulation_steps,
         learning_rate=float(config.get("learning_rate", 5e-5)),
         weight_decay=float(config.get("weight_decay", 0.01)),
         warmup_steps=int(config.get("warmup_steps", 0)),
         logging_steps=int(config.get("logging_steps", 50)),
         save_steps=int(config.get("save_steps", 500)),
         save_total_limit=int(config.get("save_total_limit", 2)),
+        dataloader_num_workers=int(config.get("dataloader_num_workers", 0)),
         prediction_loss_only=True,
+        seed=seed,
+        ignore_data_skip=streaming,
         report_to=[],
     )
 
@@ -142,12 +336,14 @@ def main():
         train_dataset=train_dataset,
         data_collator=data_collator,
     )
+    TelemetryCallback(telemetry).attach(trainer)
 
     print("Starting MLM training ...")
-    trainer.train()
+    trainer.train(resume_from_checkpoint=resume_from_checkpoint)
     print("Training complete. Saving model ...")
-    trainer.save_model(output_dir)
-    tokenizer.save_pretrained(output_dir)
+    with telemetry.phase("save"):
+        trainer.save_model(output_dir)
+        tokenizer.save_pretrained(output_dir)
 
     # Save config used
     cfg_out = Path(output_dir) / "mlm_config_used.json"
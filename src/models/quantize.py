@@ -0,0 +1,173 @@
+"""
+Export an SFT checkpoint as a dynamically quantized int8 model for CPU scoring.
+
+Takes any finetune_sft.py output directory (full fine-tune or unmerged LoRA
+adapter, which is merged first), quantizes every nn.Linear to int8 and saves
+    <out_dir>/model_int8.pt, config.json, tokenizer files, quantization.json
+which predict.py loads directly.
+
+With --test_file, the model as trained and int8 are both scored on it and
+the accuracy / macro-F1 deltas, prediction agreement and CPU throughput are
+written to <out_dir>/quantization_report.json. For a LoRA run the reference
+is the unmerged adapter on its base (with the modules it saved, e.g. the
+pooler), so errors in merging show up as well as quantization error. The
+export fails (exit code 1) if macro-F1 drops by more than --max_f1_drop.
+
+Usage:
+    python src/models/quantize.py --model_dir outputs/sft_7_mixed_mlm_with_adapter \
+        --out_dir outputs/sft_7_int8 --test_file data/processed/mixed_balanced_test.jsonl
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import AutoTokenizer
+
+from predict import (
+    QUANTIZED_META,
+    QUANTIZED_WEIGHTS,
+    Predictor,
+    checkpoint_label_map,
+    is_adapter,
+    iter_jsonl,
+    load_adapter_model,
+    load_model,
+    quantize_dynamic_int8,
+    save_label_map,
+    to_label_id,
+)
+
+
+def export_int8(model, tokenizer, label2id, out_dir, source):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    qmodel = quantize_dynamic_int8(model.eval())
+
+    torch.save(qmodel.state_dict(), out_dir / QUANTIZED_WEIGHTS)
+    qmodel.config.save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    save_label_map(label2id, out_dir)
+    with (out_dir / QUANTIZED_META).open("w") as f:
+        json.dump(
+            {"scheme": "dynamic_int8", "modules": ["Linear"], "source": str(source), "torch": torch.__version__},
+            f,
+            indent=2,
+        )
+    print(f"Saved int8 model → {out_dir / QUANTIZED_WEIGHTS}")
+    return qmodel
+
+
+def param_bytes(model):
+    """Size of the serialized state_dict (quantized Linear weights are packed)."""
+    total = 0
+    for v in model.state_dict().values():
+        if isinstance(v, torch.Tensor):
+            total += v.numel() * v.element_size()
+        elif isinstance(v, tuple):  # packed params of quantized Linear: (weight, bias)
+            total += sum(t.numel() * t.element_size() for t in v if isinstance(t, torch.Tensor))
+    return total
+
+
+def evaluate(predictor, texts, labels, batch_size):
+    input_ids = predictor.encode(texts)
+    # warm-up batch so one-time kernel/allocator setup isn't timed
+    predictor.score(input_ids[:batch_size], batch_size=batch_size)
+
+    start = time.perf_counter()
+    probs = predictor.score(input_ids, batch_size=batch_size)
+    seconds = time.perf_counter() - start
+    preds = probs.argmax(axis=-1)
+    return preds, {
+        "accuracy": float(accuracy_score(labels, preds)),
+        "macro_f1": float(f1_score(labels, preds, average="macro")),
+        "examples_per_sec": len(texts) / seconds,
+    }
+
+
+def parity_report(trained_model, int8_model, tokenizer, label2id, test_file, batch_size, max_length, fp32_bytes):
+    """int8 against the model as trained (fp32; for LoRA runs the unmerged adapter)."""
+    records = list(iter_jsonl(test_file))
+    labels = np.array([to_label_id(r["label"], label2id) for r in records])
+
+    fp32 = Predictor(trained_model, tokenizer, "cpu", max_length, label2id=label2id)
+    int8 = Predictor(int8_model, tokenizer, "cpu", max_length, label2id=label2id)
+    texts = [fp32.prepare(r) for r in records]
+
+    fp32_preds, fp32_metrics = evaluate(fp32, texts, labels, batch_size)
+    int8_preds, int8_metrics = evaluate(int8, texts, labels, batch_size)
+
+    return {
+        "test_file": str(test_file),
+        "n": len(records),
+        "fp32": fp32_metrics,
+        "int8": int8_metrics,
+        "delta_accuracy": int8_metrics["accuracy"] - fp32_metrics["accuracy"],
+        "delta_macro_f1": int8_metrics["macro_f1"] - fp32_metrics["macro_f1"],
+        "prediction_agreement": float((fp32_preds == int8_preds).mean()),
+        "speedup": int8_metrics["examples_per_sec"] / fp32_metrics["examples_per_sec"],
+        "fp32_mb": fp32_bytes / 1e6,
+        "int8_mb": param_bytes(int8_model) / 1e6,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Dynamic int8 export of an SFT checkpoint")
+    parser.add_argument("--model_dir", type=str, required=True)
+    parser.add_argument("--out_dir", type=str, required=True)
+    parser.add_argument("--test_file", type=str, default=None, help="Labeled JSONL for the fp32/int8 parity check")
+    parser.add_argument("--max_f1_drop", type=float, default=0.01)
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--max_length", type=int, default=256)
+    parser.add_argument("--num_threads", type=int, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.num_threads:
+        torch.set_num_threads(args.num_threads)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir, use_fast=True)
+    if is_adapter(args.model_dir):
+        trained_model = load_adapter_model(args.model_dir, tokenizer).eval()
+        # merge_and_unload works in place; keep the unmerged adapter as the parity reference
+        fp32_model = copy.deepcopy(trained_model).merge_and_unload().eval()
+    else:
+        trained_model = fp32_model = load_model(args.model_dir, tokenizer).eval()
+    label2id = checkpoint_label_map(args.model_dir, fp32_model.config)
+    # quantize_dynamic copies the model, fp32_model stays intact
+    int8_model = export_int8(fp32_model, tokenizer, label2id, args.out_dir, args.model_dir)
+
+    if not args.test_file:
+        return
+
+    report = parity_report(
+        trained_model, int8_model, tokenizer, label2id, args.test_file, args.batch_size, args.max_length,
+        param_bytes(fp32_model),
+    )
+    with (Path(args.out_dir) / "quantization_report.json").open("w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"fp32: acc={report['fp32']['accuracy']:.4f} macro-F1={report['fp32']['macro_f1']:.4f}")
+    print(f"int8: acc={report['int8']['accuracy']:.4f} macro-F1={report['int8']['macro_f1']:.4f}")
+    print(
+        f"Δacc={report['delta_accuracy']:+.4f} ΔmacroF1={report['delta_macro_f1']:+.4f} "
+        f"agreement={report['prediction_agreement']:.2%} speedup={report['speedup']:.2f}x "
+        f"size {report['fp32_mb']:.0f}MB → {report['int8_mb']:.0f}MB"
+    )
+
+    if report["delta_macro_f1"] < -args.max_f1_drop:
+        print(f"❌ macro-F1 dropped by more than {args.max_f1_drop}; do not ship this export.")
+        sys.exit(1)
+    print("✅ int8 model within tolerance.")
+
+
+if __name__ == "__main__":
+    main()
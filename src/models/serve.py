@@ -0,0 +1,375 @@
+"""
+Local micro-batching HTTP server for the SFT classifiers.
+
+Single-text requests are queued and flushed to the model as one batch when
+either --max_batch_size requests are waiting or the oldest has waited
+--max_wait_ms. The model runs in a worker thread, so the event loop keeps
+accepting requests while a batch is being scored.
+
+  POST /predict   {"text": "...", "domain": "FIN"}  ->  {"pred_label", "pred_name", "probs"}
+  GET  /metrics   latency p50/p99, batch occupancy, queue depth, rejections, timeouts
+                  (+ prediction cache hits/evictions with --cache_size / --cache_db)
+  GET  /health
+
+Backpressure: when --max_queue requests are already waiting, new ones get
+503 immediately. Requests not answered within --timeout_ms get 504.
+Bodies that aren't {"text": str, "domain"?: str} get 400. If a batch fails to
+score, its requests are rescored one by one, so only the failing request
+gets a 500 and the rest of its batch is answered normally.
+
+Only the standard library is used for HTTP, so the server and its load test
+run fully offline:
+    python src/models/serve.py --model_dir outputs/sft_4_onnx --port 8080
+    python src/models/serve.py loadtest --port 8080 --input data/processed/finance_test.jsonl
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from predict import iter_jsonl, load_predictor, prediction_record, score_with_cache
+from prediction_cache import make_prediction_cache
+
+
+class MicroBatcher:
+    def __init__(self, predictor, max_batch_size=32, max_wait_ms=5.0, max_queue=1024, timeout_ms=1000.0, cache=None):
+        self.predictor = predictor
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+        self.latencies = deque(maxlen=10000)
+        self.batch_sizes = deque(maxlen=10000)
+        self.counts = {"requests": 0, "completed": 0, "rejected": 0, "timeouts": 0, "errors": 0, "batches": 0}
+
+    async def predict(self, record):
+        """Queue one record and wait for its batch. Raises QueueFull / TimeoutError."""
+        self.counts["requests"] += 1
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((record, future))
+        except asyncio.QueueFull:
+            self.counts["rejected"] += 1
+            raise
+
+        try:
+            result = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        self.counts["completed"] += 1
+        return result
+
+    async def _collect(self):
+        """Wait for one request, then gather more until the batch is full or max_wait passes."""
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # requests that already timed out are not worth scoring
+        return [(r, f) for r, f in batch if not f.done()]
+
+    def _score(self, records):
+        p = self.predictor
+        if self.cache is not None:
+            probs, _ = score_with_cache(records, p, self.cache, batch_size=len(records))
+        else:
+            probs = p.score(p.encode([p.prepare(r) for r in records]), batch_size=len(records))
+        return [prediction_record({}, row, p.id2label) for row in probs]
+
+    def _score_each(self, records):
+        """One record at a time; a record that fails gets its exception in place of a result."""
+        results = []
+        for record in records:
+            try:
+                results.append(self._score([record])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.counts["batches"] += 1
+            self.batch_sizes.append(len(batch))
+            records = [r for r, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self._score, records)
+            except Exception:
+                # rescore one by one so only the request that broke the batch fails
+                results = await loop.run_in_executor(None, self._score_each, records)
+            for (_, f), res in zip(batch, results):
+                if f.done():
+                    continue
+                if isinstance(res, Exception):
+                    self.counts["errors"] += 1
+                    f.set_exception(res)
+                else:
+                    f.set_result(res)
+
+    def metrics(self):
+        lat = np.array(self.latencies) * 1000.0
+        sizes = np.array(self.batch_sizes)
+        out = {
+            **self.counts,
+            "queue_depth": self.queue.qsize(),
+            "latency_ms_p50": float(np.percentile(lat, 50)) if len(lat) else None,
+            "latency_ms_p99": float(np.percentile(lat, 99)) if len(lat) else None,
+            "mean_batch_size": float(sizes.mean()) if len(sizes) else None,
+            "batch_occupancy": float(sizes.mean() / self.max_batch_size) if len(sizes) else None,
+        }
+        if self.cache is not None:
+            out["cache"] = self.cache.report()
+        return out
+
+
+# ---------------- minimal HTTP/1.1 ----------------
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+async def read_request(reader):
+    """Return (method, path, headers, body) or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, path, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, v = h.decode("latin-1").split(":", 1)
+        headers[k.strip().lower()] = v.strip()
+    length = int(headers.get("content-length", 0))
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def write_response(writer, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+
+
+def parse_predict_body(body):
+    """The /predict record, or None unless the body is {"text": str, "domain"?: str | null}."""
+    try:
+        record = json.loads(body)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or not isinstance(record.get("text"), str):
+        return None
+    if not isinstance(record.get("domain"), (str, type(None))):
+        return None
+    return record
+
+
+async def route(batcher, method, path, body):
+    if method == "GET" and path == "/health":
+        return 200, {"status": "ok"}
+    if method == "GET" and path == "/metrics":
+        return 200, batcher.metrics()
+    if method == "POST" and path == "/predict":
+        record = parse_predict_body(body)
+        if record is None:
+            return 400, {"error": 'expected JSON body {"text": str, "domain"?: str}'}
+        try:
+            return 200, await batcher.predict(record)
+        except asyncio.QueueFull:
+            return 503, {"error": "queue full"}
+        except asyncio.TimeoutError:
+            return 504, {"error": "timed out"}
+    return 404, {"error": f"no route {method} {path}"}
+
+
+async def handle(batcher, method, path, body):
+    """route(), with any unexpected error answered as a 500 instead of dropping the connection."""
+    try:
+        return await route(batcher, method, path, body)
+    except Exception as e:
+        return 500, {"error": f"{type(e).__name__}: {e}"}
+
+
+def make_connection_handler(batcher):
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                req = await read_request(reader)
+                if req is None:
+                    break
+                method, path, headers, body = req
+                status, payload = await handle(batcher, method, path, body)
+                write_response(writer, status, payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return on_connection
+
+
+async def serve(args):
+    predictor = load_predictor(args.model_dir, args.device, args.max_length, args.domain_prefix, args.num_threads)
+    cache = None
+    if args.cache_size or args.cache_db:
+        cache = make_prediction_cache(args.model_dir, predictor, args.cache_size or 100_000, args.cache_db)
+    batcher = MicroBatcher(
+        predictor, args.max_batch_size, args.max_wait_ms, args.max_queue, args.timeout_ms, cache
+    )
+    # one full batch up front so kernel/allocator setup doesn't eat the first requests' deadline
+    predictor.score(predictor.encode(["warm up"] * args.max_batch_size), batch_size=args.max_batch_size)
+    server = await asyncio.start_server(make_connection_handler(batcher), args.host, args.port)
+    print(
+        f"Serving {args.model_dir} on http://{args.host}:{args.port} "
+        f"(max_batch_size={args.max_batch_size}, max_wait_ms={args.max_wait_ms})",
+        file=sys.stderr,
+    )
+    async with server:
+        await asyncio.gather(server.serve_forever(), batcher.run())
+
+
+# ---------------- offline load test ----------------
+
+async def http_call(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(
+        (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+         f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        if h.lower().startswith(b"content-length:"):
+            length = int(h.split(b":", 1)[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def load_test(args):
+    records = list(itertools.islice(iter_jsonl(args.input), args.num_requests))
+    if not records:
+        raise ValueError(f"No records in {args.input}")
+    todo = deque(itertools.islice(itertools.cycle(records), args.num_requests))
+    latencies, statuses = [], {}
+
+    async def client():
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        try:
+            while todo:
+                r = todo.popleft()
+                start = time.perf_counter()
+                status, _ = await http_call(
+                    reader, writer, args.host, "POST", "/predict", {"text": r["text"], "domain": r.get("domain")}
+                )
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    seconds = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, server_metrics = await http_call(reader, writer, args.host, "GET", "/metrics")
+    writer.close()
+
+    lat = np.array(latencies) * 1000.0
+    print(
+        json.dumps(
+            {
+                "requests": len(latencies),
+                "concurrency": args.concurrency,
+                "requests_per_sec": len(latencies) / seconds,
+                "client_latency_ms_p50": float(np.percentile(lat, 50)),
+                "client_latency_ms_p99": float(np.percentile(lat, 99)),
+                "status_counts": statuses,
+                "server": server_metrics,
+            },
+            indent=2,
+        )
+    )
+
+
+def parse_args(argv):
+    if argv and argv[0] == "loadtest":
+        parser = argparse.ArgumentParser(description="Offline load test against a running serve.py")
+        parser.add_argument("--host", type=str, default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8080)
+        parser.add_argument("--input", type=str, required=True, help="JSONL whose 'text' fields are sent")
+        parser.add_argument("--num_requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=64)
+        args = parser.parse_args(argv[1:])
+        args.command = "loadtest"
+        return args
+
+    parser = argparse.ArgumentParser(description="Micro-batching HTTP server for SFT classifiers")
+    parser.add_argument("--model_dir", type=str, required=True)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max_batch_size", type=int, default=32)
+    parser.add_argument("--max_wait_ms", type=float, default=5.0)
+    parser.add_argument("--max_queue", type=int, default=1024, help="Pending requests before 503")
+    parser.add_argument("--timeout_ms", type=float, default=1000.0, help="Per-request deadline before 504")
+    parser.add_argument("--max_length", type=int, default=256)
+    parser.add_argument("--num_threads", type=int, default=None)
+    parser.add_argument("--device", type=str, default=None)
+    parser.add_argument("--domain_prefix", choices=["auto", "on", "off"], default="auto")
+    parser.add_argument("--cache_size", type=int, default=0, help="In-memory prediction cache entries (0: off)")
+    parser.add_argument("--cache_db", type=str, default=None, help="SQLite file persisting cached predictions")
+    args = parser.parse_args(argv)
+    args.command = "serve"
+    return args
+
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.command == "loadtest":
+        asyncio.run(load_test(args))
+    else:
+        if args.num_threads:
+            import torch
+
+            torch.set_num_threads(args.num_threads)
+        asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Paired bootstrap and McNemar tests for every pair of SFT checkpoints.
+
+Replaces the loop in "paired bootstrap analysis.ipynb" (one sklearn call per
+resample per model) with index matrices: each chunk of resamples is a
+(chunk, n) matrix of row indices shared by all models, so every comparison is
+paired. Per resample and model, a 3x3 confusion matrix comes from a single
+np.bincount, and accuracy / macro-F1 follow from its diagonal and marginals.
+Macro-F1 averages over the classes present in that resample's labels or
+predictions, the same as sklearn's f1_score(average="macro").
+
+McNemar uses the exact binomial test on the discordant pairs, as the notebook
+did with statsmodels' mcnemar(exact=True).
+
+Input is either the evaluate.py predictions_file (all models, all test sets)
+or .npy files like the notebook saved:
+    python src/models/significance.py --predictions outputs/eval_predictions.npz --test_set mixed
+    python src/models/significance.py --labels labels.npy --pred sft4=preds_sft4.npy --pred sft7=preds_sft7.npy
+"""
+
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+from scipy.stats import binom
+
+
+def bootstrap_metrics(y_true, preds, n_resamples=10000, seed=42, chunk_size=1000, num_classes=None):
+    """
+    Accuracy and macro-F1 of every model on the same bootstrap resamples.
+
+    preds: (n_models, n) predicted ids. Returns two (n_models, n_resamples) arrays.
+    """
+    y_true = np.asarray(y_true, dtype=np.int64)
+    preds = np.asarray(preds, dtype=np.int64)
+    k = num_classes or int(max(y_true.max(), preds.max())) + 1
+    n_models, n = preds.shape
+    codes = y_true[None, :] * k + preds  # confusion-matrix cell per example
+
+    rng = np.random.default_rng(seed)
+    acc = np.empty((n_models, n_resamples))
+    macro_f1 = np.empty((n_models, n_resamples))
+
+    for start in range(0, n_resamples, chunk_size):
+        b = min(chunk_size, n_resamples - start)
+        idx = rng.integers(0, n, size=(b, n))
+        offsets = (np.arange(b) * k * k)[:, None]
+        for m in range(n_models):
+            cm = np.bincount((codes[m][idx] + offsets).ravel(), minlength=b * k * k).reshape(b, k, k)
+            tp = np.diagonal(cm, axis1=1, axis2=2)
+            support = cm.sum(axis=2) + cm.sum(axis=1)  # true + predicted count per class
+            present = support > 0
+            f1 = np.divide(2 * tp, support, out=np.zeros(tp.shape), where=present)
+            acc[m, start : start + b] = tp.sum(axis=1) / n
+            macro_f1[m, start : start + b] = f1.sum(axis=1) / present.sum(axis=1)
+    return acc, macro_f1
+
+
+def point_metrics(y_true, pred, k):
+    cm = np.bincount(y_true * k + pred, minlength=k * k).reshape(k, k)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1) + cm.sum(axis=0)
+    present = support > 0
+    f1 = np.divide(2 * tp, support, out=np.zeros(k), where=present)
+    return float(tp.sum() / len(y_true)), float(f1.sum() / present.sum())
+
+
+def mcnemar_exact(correct_a, correct_b):
+    b = int(np.sum(correct_a & ~correct_b))  # A right, B wrong
+    c = int(np.sum(~correct_a & correct_b))  # A wrong, B right
+    p = 1.0 if b + c == 0 else min(1.0, 2 * binom.cdf(min(b, c), b + c, 0.5))
+    return {"a_right_b_wrong": b, "a_wrong_b_right": c, "p_value": float(p)}
+
+
+def ci(samples, alpha):
+    lo, hi = np.quantile(samples, [alpha / 2, 1 - alpha / 2])
+    return [float(lo), float(hi)]
+
+
+def compare_models(y_true, preds_by_model, n_resamples=10000, seed=42, alpha=0.05, chunk_size=1000):
+    names = list(preds_by_model)
+    y_true = np.asarray(y_true, dtype=np.int64)
+    preds = np.stack([np.asarray(preds_by_model[m], dtype=np.int64) for m in names])
+    if preds.shape[1] != len(y_true):
+        raise ValueError(f"Predictions cover {preds.shape[1]} examples, labels {len(y_true)}")
+    k = int(max(y_true.max(), preds.max())) + 1
+
+    acc, macro_f1 = bootstrap_metrics(y_true, preds, n_resamples, seed, chunk_size, k)
+
+    models = {}
+    for i, m in enumerate(names):
+        point_acc, point_f1 = point_metrics(y_true, preds[i], k)
+        models[m] = {
+            "accuracy": point_acc,
+            "accuracy_ci": ci(acc[i], alpha),
+            "macro_f1": point_f1,
+            "macro_f1_ci": ci(macro_f1[i], alpha),
+        }
+
+    correct = preds == y_true[None, :]
+    pairs = []
+    for i, j in itertools.combinations(range(len(names)), 2):
+        d_acc = acc[i] - acc[j]
+        d_f1 = macro_f1[i] - macro_f1[j]
+        pairs.append(
+            {
+                "a": names[i],
+                "b": names[j],
+                "delta_accuracy": models[names[i]]["accuracy"] - models[names[j]]["accuracy"],
+                "delta_accuracy_ci": ci(d_acc, alpha),
+                # two-sided bootstrap p: how often the sign of the difference flips
+                "delta_accuracy_p": float(min(1.0, 2 * min((d_acc <= 0).mean(), (d_acc >= 0).mean()))),
+                "delta_macro_f1": models[names[i]]["macro_f1"] - models[names[j]]["macro_f1"],
+                "delta_macro_f1_ci": ci(d_f1, alpha),
+                "delta_macro_f1_p": float(min(1.0, 2 * min((d_f1 <= 0).mean(), (d_f1 >= 0).mean()))),
+                "mcnemar": mcnemar_exact(correct[i], correct[j]),
+            }
+        )
+    return {"n": int(len(y_true)), "n_resamples": n_resamples, "alpha": alpha, "models": models, "pairs": pairs}
+
+
+def load_from_npz(path, test_set):
+    data = np.load(path)
+    prefix = f"{test_set}/"
+    labels = data[prefix + "labels"]
+    preds = {
+        key[len(prefix) :]: data[key]
+        for key in data.files
+        if key.startswith(prefix) and key not in (prefix + "labels", prefix + "domains")
+    }
+    return labels, preds
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Paired bootstrap + McNemar for all model pairs")
+    parser.add_argument("--predictions", type=str, default=None, help="evaluate.py predictions_file (.npz)")
+    parser.add_argument("--test_set", type=str, default=None, help="Test set name inside --predictions")
+    parser.add_argument("--labels", type=str, default=None, help="Gold labels .npy")
+    parser.add_argument("--pred", action="append", help="NAME=preds.npy (repeatable)")
+    parser.add_argument("--n_resamples", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--chunk_size", type=int, default=1000, help="Resamples per index matrix")
+    parser.add_argument("--output", type=str, default=None)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.predictions:
+        if not args.test_set:
+            raise ValueError("--test_set is required with --predictions")
+        labels, preds = load_from_npz(args.predictions, args.test_set)
+    else:
+        if not (args.labels and args.pred):
+            raise ValueError("Give --predictions/--test_set or --labels with --pred NAME=PATH")
+        labels = np.load(args.labels)
+        preds = dict(p.split("=", 1) for p in args.pred)
+        preds = {name: np.load(path) for name, path in preds.items()}
+    if len(preds) < 2:
+        raise ValueError(f"Need at least two models to compare, got {sorted(preds)}")
+
+    start = time.perf_counter()
+    report = compare_models(labels, preds, args.n_resamples, args.seed, args.alpha, args.chunk_size)
+    report["seconds"] = time.perf_counter() - start
+
+    level = int(round((1 - args.alpha) * 100))
+    for name, m in report["models"].items():
+        print(
+            f"{name:>10}: acc={m['accuracy']:.4f} [{m['accuracy_ci'][0]:.4f}, {m['accuracy_ci'][1]:.4f}] "
+            f"macroF1={m['macro_f1']:.4f} [{m['macro_f1_ci'][0]:.4f}, {m['macro_f1_ci'][1]:.4f}]"
+        )
+    for p in report["pairs"]:
+        print(
+            f"{p['a']} vs {p['b']}: ΔAcc={p['delta_accuracy']:+.4f} {level}% CI "
+            f"[{p['delta_accuracy_ci'][0]:+.4f}, {p['delta_accuracy_ci'][1]:+.4f}]  "
+            f"ΔMacro={p['delta_macro_f1']:+.4f} [{p['delta_macro_f1_ci'][0]:+.4f}, {p['delta_macro_f1_ci'][1]:+.4f}]  "
+            f"McNemar p={p['mcnemar']['p_value']:.4g}"
+        )
+    print(f"{len(report['pairs'])} pairs, {args.n_resamples} resamples in {report['seconds']:.2f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Per-phase timing, throughput and memory telemetry for the training scripts.
+
+pretraining_mlm.py and finetune_sft.py append one JSON record per event to
+<output_dir>/telemetry.jsonl (next to mlm_config_used.json), flushed as it
+happens, so a preempted job still leaves what it measured:
+
+  {"event": "start", ...}                      script, config, host, pid
+  {"event": "phase", "phase": "tokenize", ...} wall time of load_model /
+                                               load_data / tokenize / pack / eval / save
+  {"event": "progress", "step": 500, ...}      every logging_steps: rates since the last log
+  {"event": "phase", "phase": "train", ...}    totals for the whole train() call
+
+Under torchrun / accelerate launch only rank 0 writes the file (the other
+ranks measure but keep their records in memory), like Trainer's own logging.
+
+Every record carries peak_rss_mb (this process, ru_maxrss) and
+peak_rss_children_mb (largest finished child: datasets.map / dataloader
+workers), plus peak_gpu_mb when CUDA is in use.
+
+Train / progress records also have
+  samples_per_second, tokens_per_second   padded tokens (what the model computes on)
+  nonpad_ratio                            attention_mask tokens / padded tokens
+  dataloader_wait_seconds / _fraction     time the training loop spent waiting
+                                          for the next batch, as a share of step time
+
+Step time excludes evaluation (reported in its own eval phase records). A
+dataloader_wait_fraction near 0 means the job is compute-bound; a large one
+means the GPU sits idle waiting on data (raise dataloader_num_workers, use a
+token store instead of streaming, ...).
+
+Usage:
+    telemetry = Telemetry(Path(output_dir) / TELEMETRY_FILE)
+    with telemetry.phase("tokenize", file=path):
+        ...
+    TelemetryCallback(telemetry).attach(trainer)
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from transformers import TrainerCallback
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+
+TELEMETRY_FILE = "telemetry.jsonl"
+
+
+def _maxrss_mb(who):
+    if resource is None:
+        return None
+    kb = resource.getrusage(who).ru_maxrss
+    if sys.platform == "darwin":  # bytes there, kilobytes on Linux
+        kb /= 1024
+    return round(kb / 1024, 1)
+
+
+def memory_stats():
+    """Peak resident memory so far (MB) for this process and its children, and peak GPU memory."""
+    stats = {
+        "peak_rss_mb": _maxrss_mb(resource.RUSAGE_SELF) if resource else None,
+        "peak_rss_children_mb": _maxrss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+    }
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        stats["peak_gpu_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    return stats
+
+
+def is_main_process():
+    return int(os.environ.get("RANK", 0)) == 0
+
+
+class Telemetry:
+    """Appends JSON records to path; with path=None (or on ranks other than 0) they are only kept in .records."""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path and is_main_process() else None
+        self.records = []
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def log(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 3), **fields, **memory_stats()}
+        self.records.append(record)
+        if self.path is not None:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def start(self, script, config_path=None, **fields):
+        return self.log(
+            "start", script=script, config=config_path, host=socket.gethostname(), pid=os.getpid(), **fields
+        )
+
+    @contextmanager
+    def phase(self, name, **fields):
+        """Time the block and log it as one phase record (also when it raises)."""
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = round(time.perf_counter() - t0, 3)
+            self.log("phase", phase=name, seconds=seconds, **fields, **({} if ok else {"failed": True}))
+
+
+class _Counters:
+    def __init__(self):
+        self.samples = 0
+        self.tokens = 0
+        self.real_tokens = 0  # int, or a device tensor summed lazily to avoid a sync every step
+        self.wait = 0.0
+        self.eval = 0.0
+        self.t0 = time.perf_counter()
+
+    def rates(self, now):
+        seconds = now - self.t0
+        step_seconds = max(seconds - self.eval, 1e-9)
+        real = int(self.real_tokens)
+        return {
+            "seconds": round(seconds, 3),
+            "step_seconds": round(step_seconds, 3),
+            "eval_seconds": round(self.eval, 3),
+            "samples": self.samples,
+            "tokens": self.tokens,
+            "samples_per_second": round(self.samples / step_seconds, 2),
+            "tokens_per_second": round(self.tokens / step_seconds, 1),
+            "nonpad_ratio": round(real / self.tokens, 4) if self.tokens else None,
+            "dataloader_wait_seconds": round(self.wait, 3),
+            "dataloader_wait_fraction": round(self.wait / step_seconds, 4),
+        }
+
+
+class TelemetryCallback(TrainerCallback):
+    """
+    Throughput and dataloader-wait telemetry for a Trainer.
+
+    attach() registers the callback and wraps trainer.training_step (to count
+    the samples / tokens of every batch and timestamp when it arrives) and
+    trainer.evaluate (eval phase records). Dataloader wait is the time from
+    the end of the previous host-side work (training step, optimizer step,
+    logging, checkpoint save, evaluation) to the start of the next training
+    step, i.e. fetching and collating the batch.
+    """
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+        self.total = None
+        self.interval = None
+        self._mark = None
+        self._in_eval = False
+
+    def attach(self, trainer):
+        trainer.add_callback(self)
+        training_step = trainer.training_step
+        evaluate = trainer.evaluate
+
+        def timed_training_step(model, inputs, *args, **kwargs):
+            self._batch_arrived(inputs)
+            try:
+                return training_step(model, inputs, *args, **kwargs)
+            finally:
+                self._mark = time.perf_counter()
+
+        def timed_evaluate(*args, **kwargs):
+            t0 = time.perf_counter()
+            self._in_eval = True  # evaluate() logs its metrics: not a training interval
+            try:
+                with self.telemetry.phase("eval", step=trainer.state.global_step):
+                    result = evaluate(*args, **kwargs)
+            finally:
+                self._in_eval = False
+            seconds = time.perf_counter() - t0
+            for counters in (self.total, self.interval):
+                if counters is not None:
+                    counters.eval += seconds
+            self._mark = time.perf_counter()
+            return result
+
+        trainer.training_step = timed_training_step
+        trainer.evaluate = timed_evaluate
+        return self
+
+    def _batch_arrived(self, inputs):
+        now = time.perf_counter()
+        if self.total is None:  # training_step outside train(): nothing to attribute it to
+            return
+        waited = now - self._mark if self._mark is not None else 0.0
+        input_ids = inputs.get("input_ids")
+        mask = inputs.get("attention_mask")
+        samples = int(input_ids.shape[0]) if input_ids is not None else 0
+        tokens = int(input_ids.numel()) if input_ids is not None else 0
+        real = mask.sum() if mask is not None else tokens
+        for counters in (self.total, self.interval):
+            counters.wait += waited
+            counters.samples += samples
+            counters.tokens += tokens
+            counters.real_tokens = counters.real_tokens + real
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.total = _Counters()
+        self.interval = _Counters()
+        self._mark = time.perf_counter()
+
+    def on_step_end(self, args, state, control, **kwargs):
+        self._mark = time.perf_counter()
+
+    def on_save(self, args, state, control, **kwargs):
+        self._mark = time.perf_counter()
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if self.interval is None or self._in_eval or not self.interval.samples:
+            return
+        now = time.perf_counter()
+        self.telemetry.log("progress", step=state.global_step, **self.interval.rates(now))
+        self.interval = _Counters()
+        self._mark = time.perf_counter()
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if self.total is None:
+            return
+        record = self.telemetry.log(
+            "phase", phase="train", step=state.global_step, **self.total.rates(time.perf_counter())
+        )
+        nonpad = record["nonpad_ratio"]
+        print(
+            f"Telemetry: {record['samples_per_second']} samples/s, {record['tokens_per_second']} tokens/s, "
+            f"non-padding {nonpad if nonpad is not None else 'n/a'}, "
+            f"dataloader wait {record['dataloader_wait_fraction']:.1%} of step time"
+            + (f" → {self.telemetry.path}" if self.telemetry.path else "")
+        )
+        self.total = self.interval = None
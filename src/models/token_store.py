@@ -0,0 +1,165 @@
+"""
+Memory-mapped binary token store for packed MLM data.
+
+A store is three files sharing one prefix:
+  <prefix>.bin       all input_ids back to back (uint16, or uint32 for vocabs >= 65536)
+  <prefix>.idx.npy   int64 offsets, block i is bin[idx[i]:idx[i + 1]]
+  <prefix>.json      dtype, sizes and the stamp of the inputs it was built from
+
+MemmapTokenDataset reads blocks straight out of the page cache, so several
+dataloader workers (and several jobs on one node) share one copy of the
+corpus instead of each decoding its own Arrow table.
+
+Export from a config without training:
+    python src/models/token_store.py --config src/configs/mlm_bertgoemotions_biomed_finance.yaml
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pyarrow.compute as pc
+from torch.utils.data import Dataset
+
+from mlm_cache import tokenizer_fingerprint
+
+
+EXPORT_BATCH_SIZE = 10000
+
+
+def store_paths(prefix):
+    prefix = Path(prefix)
+    return (
+        prefix.with_name(prefix.name + ".bin"),
+        prefix.with_name(prefix.name + ".idx.npy"),
+        prefix.with_name(prefix.name + ".json"),
+    )
+
+
+def token_dtype(vocab_size):
+    return np.uint16 if vocab_size < 2**16 else np.uint32
+
+
+def source_stamp(train_files, tokenizer, **params):
+    """Cheap identity of what a store was built from (file size + mtime, not content)."""
+    files = []
+    for file in train_files:
+        st = Path(file).stat()
+        files.append([str(Path(file).resolve()), st.st_size, st.st_mtime_ns])
+    return {
+        "files": files,
+        "tokenizer": tokenizer_fingerprint(tokenizer),
+        "params": params,
+    }
+
+
+def export_token_store(dataset, prefix, vocab_size, stamp=None):
+    """Write the input_ids of a packed dataset to <prefix>.bin / .idx.npy / .json."""
+    bin_path, idx_path, meta_path = store_paths(prefix)
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    dtype = token_dtype(vocab_size)
+
+    tmp_bin = bin_path.with_name(bin_path.name + f".tmp{os.getpid()}")
+    lengths = []
+    with tmp_bin.open("wb") as f:
+        for batch in dataset.with_format("arrow").iter(batch_size=EXPORT_BATCH_SIZE):
+            ids = batch.column("input_ids").combine_chunks()
+            lengths.append(pc.list_value_length(ids).to_numpy())
+            f.write(ids.flatten().to_numpy().astype(dtype).tobytes())
+
+    offsets = np.zeros(len(dataset) + 1, dtype=np.int64)
+    if lengths:
+        np.cumsum(np.concatenate(lengths), out=offsets[1:])
+
+    tmp_idx = idx_path.with_name(f"tmp{os.getpid()}.idx.npy")
+    np.save(tmp_idx, offsets)
+
+    os.replace(tmp_bin, bin_path)
+    os.replace(tmp_idx, idx_path)
+    meta = {
+        "dtype": np.dtype(dtype).name,
+        "num_blocks": len(dataset),
+        "num_tokens": int(offsets[-1]),
+        "vocab_size": vocab_size,
+        "stamp": stamp,
+    }
+    with meta_path.open("w") as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Exported {meta['num_blocks']} blocks / {meta['num_tokens']} tokens → {bin_path}")
+    return meta
+
+
+def read_store_meta(prefix):
+    _, _, meta_path = store_paths(prefix)
+    if not meta_path.exists():
+        return None
+    with meta_path.open("r") as f:
+        return json.load(f)
+
+
+class MemmapTokenDataset(Dataset):
+    """
+    Packed MLM blocks read from a token store via np.memmap.
+
+    The memmap is opened lazily in each process, so forked dataloader
+    workers map the file themselves instead of pickling a copy.
+    Packed blocks have no padding and a single segment, so
+    attention_mask and token_type_ids are rebuilt rather than stored.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        meta = read_store_meta(prefix)
+        if meta is None:
+            raise FileNotFoundError(f"No token store at {prefix}")
+        self.dtype = np.dtype(meta["dtype"])
+        self.offsets = np.load(store_paths(prefix)[1], mmap_mode="r")
+        self._tokens = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = np.memmap(store_paths(self.prefix)[0], dtype=self.dtype, mode="r")
+        return self._tokens
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_tokens"] = None
+        return state
+
+    def __getitem__(self, i):
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        input_ids = self.tokens[start:end].astype(np.int64).tolist()
+        n = len(input_ids)
+        return {
+            "input_ids": input_ids,
+            "token_type_ids": [0] * n,
+            "attention_mask": [1] * n,
+        }
+
+
+def main():
+    from transformers import AutoTokenizer
+
+    from pretraining_mlm import build_token_store, load_config
+
+    parser = argparse.ArgumentParser(description="Export packed MLM data to a memmap token store")
+    parser.add_argument("--config", type=str, required=True)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if not config.get("token_store"):
+        raise ValueError("Config has no token_store prefix to export to.")
+
+    tokenizer = AutoTokenizer.from_pretrained(config["model_name_or_path"], use_fast=True)
+    build_token_store(config, tokenizer)
+
+
+if __name__ == "__main__":
+    main()
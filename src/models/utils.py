@@ -0,0 +1,11 @@
+"""Small helpers shared by the training scripts."""
+
+import os
+
+
+def default_num_proc():
+    """CPUs this process may run on (respects slurm --cpus-per-task affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1